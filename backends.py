@@ -0,0 +1,164 @@
+# backends.py
+import os
+import uuid
+import joblib
+import numpy as np
+from sklearn.linear_model import Ridge
+import model_registry
+
+# Keras is imported inside the functions that need it, so serving code that
+# only resolves paths or runs a TFLite/pickled model doesn't load TensorFlow.
+
+# name → {"build": fn(input_shape, hp, learning_rate, jit_compile), "ext": file extension, "keras": bool}
+BACKENDS = {}
+
+DEFAULT_BACKEND = "lstm"
+
+# Global multi-symbol model (train.train_global_model)
+GLOBAL_MODEL_PATH = "models/global_lstm_model.h5"
+GLOBAL_SCALERS_PATH = "models/global_scalers.pkl"
+GLOBAL_METRICS_PATH = "models/global_metrics.json"
+
+
+def register_backend(name, ext=".h5", keras=True):
+    """Decorator adding a model builder to BACKENDS."""
+    def decorator(build):
+        BACKENDS[name] = {"build": build, "ext": ext, "keras": keras}
+        return build
+    return decorator
+
+
+def is_keras_backend(backend):
+    return BACKENDS[backend]["keras"]
+
+
+def model_path(symbol, backend=DEFAULT_BACKEND):
+    """models/{symbol}_{backend}_model.h5 (or .pkl); the LSTM path is the original one."""
+    return os.path.join("models", f"{symbol}_{backend}_model{BACKENDS[backend]['ext']}")
+
+
+def build_model(backend, input_shape, hp, learning_rate=0.001, jit_compile="auto"):
+    """Untrained model of `backend` for (time_steps, features) windows.
+
+    `hp` holds the train.DEFAULT_HYPERPARAMS keys. Every backend trains on the
+    same `prepare_lstm_data` windows and exposes fit/predict/input_shape.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, choose from {', '.join(BACKENDS)}")
+    return BACKENDS[backend]["build"](input_shape, hp, learning_rate, jit_compile)
+
+
+def write_atomically(path, write):
+    """Call `write(tmp)` for a temporary file next to `path`, then swap it in with os.replace.
+
+    Readers of `path` see the old file or the new one, never a half-written one.
+    The temporary name keeps the extension (Keras picks the format from it).
+    """
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.{uuid.uuid4().hex[:8]}.tmp{ext}"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def save_model(model, symbol, backend=DEFAULT_BACKEND):
+    return write_atomically(model_path(symbol, backend), model.save)
+
+
+def load_forecaster(symbol, backend=DEFAULT_BACKEND):
+    """Load the trained `backend` model for `symbol` for inference (None if missing)."""
+    path = model_registry.resolve(symbol, model_path(symbol, backend))
+    if not os.path.exists(path):
+        return None
+    if is_keras_backend(backend):
+        from keras.models import load_model
+        return load_model(path, compile=False)
+    return joblib.load(path)
+
+
+# ===========================================
+#  KERAS BACKENDS
+# ===========================================
+@register_backend("lstm")
+def _build_lstm(input_shape, hp, learning_rate, jit_compile):
+    from train import build_lstm_model
+    return build_lstm_model(input_shape, hp["units"], hp["dropout"], learning_rate, jit_compile)
+
+
+@register_backend("gru")
+def _build_gru(input_shape, hp, learning_rate, jit_compile):
+    """Same layout as the LSTM with GRU cells (a quarter fewer weights)."""
+    from keras.models import Sequential
+    from keras.layers import Input, GRU, Dense, Dropout
+    from keras.optimizers import Adam
+    units, dropout = hp["units"], hp["dropout"]
+    model = Sequential([
+        Input(shape=input_shape),
+        GRU(units, return_sequences=True),
+        Dropout(dropout),
+        GRU(units),
+        Dropout(dropout),
+        Dense(max(1, units // 2)),
+        Dense(1),
+    ])
+    model.compile(optimizer=Adam(learning_rate), loss='mean_squared_error', jit_compile=jit_compile)
+    return model
+
+
+@register_backend("conv1d")
+def _build_conv1d(input_shape, hp, learning_rate, jit_compile):
+    """Temporal convolution: stacked causal, dilated Conv1D (receptive field 15 bars)."""
+    from keras.models import Sequential
+    from keras.layers import Input, Conv1D, GlobalAveragePooling1D, Dense, Dropout
+    from keras.optimizers import Adam
+    units, dropout = hp["units"], hp["dropout"]
+    model = Sequential([
+        Input(shape=input_shape),
+        Conv1D(units, 3, padding="causal", dilation_rate=1, activation="relu"),
+        Conv1D(units, 3, padding="causal", dilation_rate=2, activation="relu"),
+        Conv1D(units, 3, padding="causal", dilation_rate=4, activation="relu"),
+        GlobalAveragePooling1D(),
+        Dropout(dropout),
+        Dense(max(1, units // 2), activation="relu"),
+        Dense(1),
+    ])
+    model.compile(optimizer=Adam(learning_rate), loss='mean_squared_error', jit_compile=jit_compile)
+    return model
+
+
+# ===========================================
+#  CLOSED-FORM BASELINE
+# ===========================================
+class RidgeForecaster:
+    """Linear autoregressive baseline: ridge regression on the flattened window.
+
+    Fitted in closed form; `fit`/`predict` accept (and ignore) the Keras
+    keyword arguments so training code can treat it like the other backends.
+    """
+
+    def __init__(self, input_shape, alpha=1e-3):
+        self.input_shape = (None, *input_shape)
+        self.ridge = Ridge(alpha=alpha)
+
+    def fit(self, X, y, **kwargs):
+        self.ridge.fit(np.asarray(X).reshape(len(X), -1), np.asarray(y))
+        return self
+
+    def predict(self, X, **kwargs):
+        X = np.asarray(X, dtype=np.float32)
+        return self.ridge.predict(X.reshape(len(X), -1)).astype(np.float32).reshape(-1, 1)
+
+    def count_params(self):
+        return int(self.ridge.coef_.size + 1)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+
+@register_backend("ridge", ext=".pkl", keras=False)
+def _build_ridge(input_shape, hp, learning_rate, jit_compile):
+    return RidgeForecaster(input_shape)
@@ -0,0 +1,266 @@
+# cache.py
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class _InFlight:
+    """A load in progress that other callers for the same key can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Thread-safe in-process cache with TTL expiry, LRU eviction and request coalescing.
+
+    Concurrent `get_or_load` calls for the same missing key share one loader
+    call: the first caller runs it, the rest block until it finishes.
+    """
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()     # key -> (expires_at, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, now):
+        self._data[key] = (now + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` at most once on a miss."""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            with self._lock:
+                self._store(key, flight.value, time.monotonic())
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self, predicate=None):
+        """Drop every entry, or only the keys for which `predicate(key)` is true."""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if predicate(k)]:
+                    del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else None,
+            }
+
+
+class ModelCache:
+    """Thread-safe cache of loaded models bounded by entry count and estimated size.
+
+    Each key holds one value tagged with a version; asking for another
+    version is a miss that replaces it. When `max_entries` or `max_bytes`
+    (sizes from `sizeof(value)`) is exceeded, the least recently used entry
+    is evicted, or with policy "lfu" the one with the fewest hits (least
+    recently used among equals). Concurrent loads of one key are coalesced.
+    """
+
+    POLICIES = ("lru", "lfu")
+
+    def __init__(self, max_entries=64, max_bytes=None, policy="lru", sizeof=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, choose from {', '.join(self.POLICIES)}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sizeof = sizeof or (lambda value: 0)
+        self._data = OrderedDict()     # key -> {"version", "value", "size", "uses"}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key, version):
+        entry = self._data.get(key)
+        if entry is None or entry["version"] != version:
+            return False, None
+        entry["uses"] += 1
+        self._data.move_to_end(key)
+        return True, entry["value"]
+
+    def _victim(self, keep):
+        candidates = [k for k in self._data if k != keep]
+        if self.policy == "lfu":
+            # min() keeps the first of equals, which is the least recently used
+            return min(candidates, key=lambda k: self._data[k]["uses"])
+        return candidates[0]
+
+    def _store(self, key, version, value):
+        if key in self._data:
+            self.bytes -= self._data.pop(key)["size"]
+            self.reloads += 1
+        size = int(self.sizeof(value))
+        self._data[key] = {"version": version, "value": value, "size": size, "uses": 0}
+        self.bytes += size
+        # The entry just stored stays even if it alone is over budget
+        while len(self._data) > 1 and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            self.bytes -= self._data.pop(self._victim(key))["size"]
+            self.evictions += 1
+
+    def get(self, key, version=None, default=None):
+        with self._lock:
+            found, value = self._lookup(key, version)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            self._store(key, version, value)
+
+    def get_or_load(self, key, loader, version=None):
+        """Cached value of `key` at `version`, calling `loader()` at most once on a miss.
+
+        A None from `loader` (nothing to load) is returned but not cached.
+        """
+        with self._lock:
+            found, value = self._lookup(key, version)
+            if found:
+                self.hits += 1
+                return value
+            flight = self._inflight.get((key, version))
+            leader = flight is None
+            if leader:
+                flight = self._inflight[(key, version)] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            if flight.value is not None:
+                with self._lock:
+                    self._store(key, version, flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop((key, version), None)
+            flight.done.set()
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry["size"]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else None,
+            }
@@ -0,0 +1,171 @@
+# candle_store.py
+
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from db import get_connection, init_db
+from ohlcv import OHLCV_COLUMNS, PRICE_COLUMNS, to_canonical
+
+# Daily bars are only final once the US session has closed (16:00 ET ≈ 21:00 UTC)
+MARKET_CLOSE_UTC_HOUR = 21
+
+# Don't ask the providers again for a symbol more often than this when the
+# expected bar is still missing (holidays, halted tickers, late providers)
+RECHECK_INTERVAL = timedelta(minutes=30)
+
+_initialized = False
+
+
+def _ensure_tables():
+    global _initialized
+    if not _initialized:
+        init_db()
+        _initialized = True
+
+
+# ===========================================
+#  READ
+# ===========================================
+def load_candles(symbol, since=None):
+    """Load stored daily candles for `symbol` (canonical frame, see ohlcv.py),
+    optionally only bars on/after `since`."""
+    _ensure_tables()
+    conn = get_connection()
+    query = "SELECT date, open, high, low, close, volume FROM candles WHERE symbol = ?"
+    params = [symbol]
+    if since is not None:
+        query += " AND date >= ?"
+        params.append(pd.Timestamp(since).strftime("%Y-%m-%d"))
+    query += " ORDER BY date"
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+
+    df['date'] = pd.to_datetime(df['date'])
+    return to_canonical(df, symbol)
+
+
+def last_stored_date(symbol):
+    """Return the date of the newest stored bar for `symbol`, or None."""
+    _ensure_tables()
+    conn = get_connection()
+    row = conn.execute("SELECT MAX(date) FROM candles WHERE symbol = ?", (symbol,)).fetchone()
+    conn.close()
+    return pd.Timestamp(row[0]) if row and row[0] else None
+
+
+def _utc(moment):
+    # Rows written before timestamps carried a zone are naive UTC
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _sync_state(symbol):
+    """(last provider check, whether the newest bar was final when stored) for `symbol`."""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT last_checked, last_bar_final FROM candle_sync WHERE symbol = ?", (symbol,)
+    ).fetchone()
+    conn.close()
+    if not row:
+        return None, False
+    checked = _utc(datetime.fromisoformat(row[0])) if row[0] else None
+    return checked, bool(row[1])
+
+
+# ===========================================
+#  WRITE
+# ===========================================
+def save_candles(symbol, df):
+    """Upsert daily candles for `symbol`; bars already stored are overwritten."""
+    _ensure_tables()
+    if df is None or df.empty:
+        mark_checked(symbol)
+        return 0
+
+    bars = df[OHLCV_COLUMNS].copy()
+    bars['date'] = pd.to_datetime(bars['date']).dt.strftime("%Y-%m-%d")
+    # sqlite3 can't bind numpy float32 scalars
+    bars[PRICE_COLUMNS] = bars[PRICE_COLUMNS].astype(float)
+    rows = [(symbol, *r) for r in bars.itertuples(index=False, name=None)]
+
+    now = datetime.now(timezone.utc)
+    conn = get_connection()
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO candles (symbol, date, open, high, low, close, volume)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    # A bar saved before its session closed is refetched once it's final
+    newest = conn.execute("SELECT MAX(date) FROM candles WHERE symbol = ?", (symbol,)).fetchone()[0]
+    final = pd.Timestamp(newest) <= expected_last_bar(now)
+    conn.execute(
+        "INSERT OR REPLACE INTO candle_sync (symbol, last_checked, last_bar_final) VALUES (?, ?, ?)",
+        (symbol, now.isoformat(), int(final)),
+    )
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def mark_checked(symbol):
+    """Remember that the providers were asked for `symbol` just now."""
+    _ensure_tables()
+    conn = get_connection()
+    conn.execute(
+        """
+        INSERT INTO candle_sync (symbol, last_checked) VALUES (?, ?)
+        ON CONFLICT(symbol) DO UPDATE SET last_checked = excluded.last_checked
+        """,
+        (symbol, datetime.now(timezone.utc).isoformat()),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ===========================================
+#  FRESHNESS
+# ===========================================
+def expected_last_bar(now=None):
+    """Date of the most recent daily bar that should be final by `now` (UTC)."""
+    now = now or datetime.now(timezone.utc)
+    day = now.date()
+    if now.hour < MARKET_CLOSE_UTC_HOUR:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:  # Saturday / Sunday
+        day -= timedelta(days=1)
+    return pd.Timestamp(day)
+
+
+def bar_is_final(symbol, date, now=None):
+    """Whether the bar of `date` for `symbol` is complete (its session has closed and,
+    if it is the newest stored bar, it was stored after the close)."""
+    day = pd.Timestamp(pd.Timestamp(date).date())
+    if day > expected_last_bar(now):
+        return False
+    last_date = last_stored_date(symbol)
+    if last_date is None or day < last_date:
+        return True
+    return _sync_state(symbol)[1]
+
+
+def needs_refresh(symbol, now=None):
+    """Return (refresh?, last stored date) for `symbol`.
+
+    The newest bar is refetched once its session has closed if it was
+    stored while the session was still open.
+    """
+    now = _utc(now or datetime.now(timezone.utc))
+    last_date = last_stored_date(symbol)
+    if last_date is None:
+        return True, None
+    expected = expected_last_bar(now)
+    checked, last_bar_final = _sync_state(symbol)
+    if last_date > expected or (last_date == expected and last_bar_final):
+        return False, last_date
+
+    # Only checks made after the missing (or unfinished) bar's close count
+    close = datetime.combine(expected.date(), datetime.min.time(), timezone.utc)
+    close += timedelta(hours=MARKET_CLOSE_UTC_HOUR)
+    if checked is not None and checked >= close and now - checked < RECHECK_INTERVAL:
+        return False, last_date
+    return True, last_date
@@ -0,0 +1,144 @@
+# compare_models.py
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from keras.callbacks import EarlyStopping
+from finnhub_client import fetch_stock_data, fetch_stock_data_many
+from feature_store import get_features
+from prepare_data import prepare_lstm_data, feature_list, inverse_transform_close
+from train import DEFAULT_HYPERPARAMS, STOCK_LIST, train_model_for_symbol
+import backends
+
+COMPARISON_PATH = os.path.join("models", "backend_comparison.csv")
+
+# A backend counts as "accurate enough" within this fraction of the best RMSE
+DEFAULT_TOLERANCE = 0.05
+
+# Single-window predictions timed per backend (median is reported)
+LATENCY_RUNS = 20
+
+
+def _latency_ms(model, X):
+    model.predict(X, verbose=0)  # warm-up (graph tracing)
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        started = time.perf_counter()
+        model.predict(X, verbose=0)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+
+def compare_symbol(symbol, backend_names=None, feature_columns=None, hyperparams=None):
+    """Train every backend on the same windows of `symbol` and measure it.
+
+    Returns one row per backend with training time, single-window and
+    batch inference latency, RMSE/MAPE on the test split and parameter count.
+    """
+    backend_names = backend_names or list(backends.BACKENDS)
+    hp = {**DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    df = fetch_stock_data(symbol)
+    if df.empty:
+        print(f"⚠️ No data available for {symbol}, skipping.")
+        return []
+
+    features = feature_list(feature_columns)
+    if len(features) > 1:
+        df = get_features(symbol, df)
+    X_train, y_train, scaler, X_test, y_test = prepare_lstm_data(
+        df, hp["time_steps"], return_test=True, feature_columns=features)
+    y_true = inverse_transform_close(scaler, y_test)
+
+    rows = []
+    for name in backend_names:
+        print(f"\n⚖️ {symbol}: training {name}...")
+        model = backends.build_model(name, (hp["time_steps"], len(features)), hp)
+        started = time.perf_counter()
+        model.fit(X_train, y_train, epochs=hp["epochs"], batch_size=hp["batch_size"], verbose=0,
+                  callbacks=[EarlyStopping(monitor='loss', patience=5, restore_best_weights=True)])
+        train_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        y_pred = inverse_transform_close(scaler, model.predict(X_test, verbose=0))
+        batch_ms = (time.perf_counter() - started) * 1000
+
+        rows.append({
+            "symbol": symbol,
+            "backend": name,
+            "rmse": float(np.sqrt(np.mean((y_true - y_pred) ** 2))),
+            "mape": float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100),
+            "train_seconds": round(train_seconds, 2),
+            "latency_ms": round(_latency_ms(model, X_test[-1:]), 3),
+            "batch_latency_ms": round(batch_ms, 3),
+            "batch_size": len(X_test),
+            "params": model.count_params(),
+            "compared_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        r = rows[-1]
+        print(f"   RMSE {r['rmse']:.3f}, MAPE {r['mape']:.2f}%, train {r['train_seconds']}s, "
+              f"latency {r['latency_ms']}ms")
+    return rows
+
+
+def cheapest_backend(rows, tolerance=DEFAULT_TOLERANCE):
+    """Lowest-latency backend whose RMSE is within `tolerance` of the best one."""
+    if not rows:
+        return None
+    best_rmse = min(r["rmse"] for r in rows)
+    good = [r for r in rows if r["rmse"] <= best_rmse * (1 + tolerance)]
+    return min(good, key=lambda r: (r["latency_ms"], r["train_seconds"]))["backend"]
+
+
+def compare_backends(symbols, backend_names=None, feature_columns=None, tolerance=DEFAULT_TOLERANCE,
+                     serve_cheapest=False):
+    """Compare backends for every symbol, save the table and optionally deploy the winner."""
+    fetch_stock_data_many(symbols)
+    results = []
+    choices = {}
+    for symbol in symbols:
+        rows = compare_symbol(symbol, backend_names, feature_columns)
+        results.extend(rows)
+        choices[symbol] = cheapest_backend(rows, tolerance)
+
+    if not results:
+        print("❌ Nothing to compare.")
+        return pd.DataFrame()
+
+    table = pd.DataFrame(results)
+    os.makedirs("models", exist_ok=True)
+    table.to_csv(COMPARISON_PATH, index=False)
+    print("\n📊 Backend comparison:")
+    print(table[["symbol", "backend", "rmse", "mape", "train_seconds", "latency_ms", "params"]]
+          .to_string(index=False))
+    print(f"\n✅ Saved to {COMPARISON_PATH}")
+
+    for symbol, backend in choices.items():
+        if backend is None:
+            continue
+        print(f"🏷️ {symbol}: cheapest accurate-enough backend is {backend}")
+        if serve_cheapest:
+            train_model_for_symbol(symbol, feature_columns=feature_columns, backend=backend)
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare forecaster backends per symbol")
+    parser.add_argument("symbols", nargs="*", help="Stock symbols (default: train.STOCK_LIST)")
+    parser.add_argument("--backends", type=str, help=f"Comma-separated subset of {','.join(backends.BACKENDS)}")
+    parser.add_argument("--features", type=str,
+                        help="Comma-separated feature-store columns to feed the models, e.g. close,volume,RSI,MACD")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Accept RMSE up to this fraction above the best backend's")
+    parser.add_argument("--serve-cheapest", action="store_true",
+                        help="Train and save the cheapest accurate-enough backend as each symbol's model")
+    args = parser.parse_args()
+
+    compare_backends(
+        [s.upper() for s in args.symbols] or STOCK_LIST,
+        backend_names=args.backends.split(",") if args.backends else None,
+        feature_columns=args.features.split(",") if args.features else None,
+        tolerance=args.tolerance,
+        serve_cheapest=args.serve_cheapest,
+    )
@@ -35,6 +35,87 @@ def init_db():
         )
     """)
 
+    # Columns added after the first release
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(retrain_logs)")}
+    for column in ("symbol", "cutoff_date"):
+        if column not in existing:
+            cur.execute(f"ALTER TABLE retrain_logs ADD COLUMN {column} TEXT")
+
+    # Prediction cache (prediction_cache.py): one row per symbol, last bar
+    # and model version; rows of replaced models are kept, marked stale
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(predictions)")}
+    for column, kind in (("symbol", "TEXT"), ("as_of", "TEXT"), ("model_version", "TEXT"),
+                         ("stale", "INTEGER DEFAULT 0")):
+        if column not in existing:
+            cur.execute(f"ALTER TABLE predictions ADD COLUMN {column} {kind}")
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_key
+        ON predictions (symbol, as_of, model_version)
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS candles (
+            symbol TEXT NOT NULL,
+            date TEXT NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            PRIMARY KEY (symbol, date)
+        ) WITHOUT ROWID
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS candle_sync (
+            symbol TEXT PRIMARY KEY,
+            last_checked TEXT
+        )
+    """)
+    # Whether the newest stored bar's session had closed when it was saved
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(candle_sync)")}
+    if "last_bar_final" not in existing:
+        cur.execute("ALTER TABLE candle_sync ADD COLUMN last_bar_final INTEGER DEFAULT 0")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS provider_health (
+            provider TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            state TEXT,
+            successes INTEGER,
+            failures INTEGER,
+            consecutive_failures INTEGER,
+            avg_latency_ms REAL,
+            cooldown REAL,
+            open_until REAL,
+            last_error TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (provider, endpoint, symbol)
+        )
+    """)
+
+    # Model registry (model_registry.py): every published version; retrain_logs
+    # rows name the version they produced in model_version
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS model_versions (
+            symbol TEXT NOT NULL,
+            version TEXT NOT NULL,
+            backend TEXT,
+            published_at TEXT,
+            PRIMARY KEY (symbol, version)
+        )
+    """)
+
+    # Requests per symbol (model_registry.note_use), ranks models to preload
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS model_usage (
+            symbol TEXT PRIMARY KEY,
+            requests INTEGER NOT NULL DEFAULT 0,
+            last_used TEXT
+        )
+    """)
+
     conn.commit()
     conn.close()
 
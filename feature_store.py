@@ -0,0 +1,103 @@
+# feature_store.py
+
+import os
+import json
+import hashlib
+import joblib
+import pandas as pd
+from indicators import add_bollinger_bands, add_rsi, add_macd
+from ohlcv import OHLCV_COLUMNS, to_canonical
+
+FEATURE_DIR = os.path.join("data", "features")
+
+DEFAULT_CONFIG = {
+    "bollinger_window": 20,
+    "rsi_period": 14,
+    "macd": True,
+}
+
+# Bars of history recomputed in front of new bars on an incremental update.
+# Rolling windows need window-1 bars; the EMAs (span <= 26) have decayed
+# their seed by a factor of ~1e-8 after 250 bars.
+WARMUP_BARS = 250
+
+def config_hash(config):
+    blob = json.dumps(config, sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:10]
+
+
+def _path(symbol, config):
+    return os.path.join(FEATURE_DIR, f"{symbol}_{config_hash(config)}.pkl")
+
+
+def compute_features(df, config=None):
+    """OHLCV plus indicator columns (Bollinger, RSI, MACD) for a candle frame."""
+    config = config or DEFAULT_CONFIG
+    features = df[OHLCV_COLUMNS].reset_index(drop=True)
+    features = add_bollinger_bands(features, window=config["bollinger_window"])
+    features = add_rsi(features, period=config["rsi_period"])
+    if config.get("macd"):
+        features = add_macd(features)
+    return features
+
+
+def _update(stored, df, config):
+    """Recompute only the tail of `stored` that `df` adds to (plus a warm-up)."""
+    last_stored = stored['date'].iloc[-1]
+    # The last stored bar may have been a partial session, so redo it too
+    new_bars = df[df['date'] >= last_stored]
+    history = stored[stored['date'] < last_stored][OHLCV_COLUMNS].tail(WARMUP_BARS)
+
+    tail = compute_features(pd.concat([history, new_bars[OHLCV_COLUMNS]], ignore_index=True), config)
+    tail = tail.iloc[len(history):]
+    kept = stored[stored['date'] < last_stored]
+    return pd.concat([kept, tail], ignore_index=True)
+
+
+def get_features(symbol, df=None, config=None):
+    """Feature matrix for `symbol` over the date range of `df`.
+
+    Matrices are persisted under data/features/ keyed by symbol and config
+    hash, and tagged with their last bar date. A stored matrix that is
+    current is returned as is; one that is behind is extended incrementally;
+    otherwise it is computed from scratch.
+    """
+    config = config or DEFAULT_CONFIG
+    if df is None:
+        from finnhub_client import fetch_stock_data
+        df = fetch_stock_data(symbol)
+    if df is None or df.empty:
+        return pd.DataFrame()
+
+    df = to_canonical(df, symbol)
+    path = _path(symbol, config)
+    entry = joblib.load(path) if os.path.exists(path) else None
+    last_bar = pd.Timestamp(df['date'].iloc[-1])
+    first_bar = pd.Timestamp(df['date'].iloc[0])
+
+    if entry is not None and entry["first_bar"] <= first_bar and entry["last_bar"] <= last_bar:
+        if entry["last_bar"] == last_bar and entry["last_close"] == float(df['close'].iloc[-1]):
+            features = entry["features"]
+        else:
+            features = _update(entry["features"], df, config)
+            _save(path, symbol, config, features)
+    else:
+        features = compute_features(df, config)
+        _save(path, symbol, config, features)
+
+    return features[features['date'] >= first_bar].reset_index(drop=True)
+
+
+def _save(path, symbol, config, features):
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump({
+        "symbol": symbol,
+        "config": config,
+        "config_hash": config_hash(config),
+        "first_bar": pd.Timestamp(features['date'].iloc[0]),
+        "last_bar": pd.Timestamp(features['date'].iloc[-1]),
+        "last_close": float(features['close'].iloc[-1]),
+        "features": features,
+    }, tmp_path)
+    os.replace(tmp_path, path)
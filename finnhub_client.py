@@ -1,11 +1,18 @@
 # finnhub_client.py
 
 import os
-import finnhub
+import time
+import asyncio
+import numpy as np
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from candle_store import load_candles, save_candles, needs_refresh
+from providers import finnhub_provider, yfinance_download, run_sync
+from provider_health import provider_health
+from cache import TTLCache
+from ohlcv import OHLCV_COLUMNS, to_canonical, empty_frame
+from provider_replay import is_live
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,85 +21,326 @@ API_KEY=os.getenv("FINNHUB_API_KEY")
 if not API_KEY:
     print("⚠️ FINNHUB_API_KEY not found in environment variables.")
 
-# Initialize Finnhub client
-finnhub_client = finnhub.Client(api_key=API_KEY) if API_KEY else None
+# Rate-limited Finnhub client (see providers.py); replay mode needs no key
+finnhub_client = finnhub_provider if API_KEY or not is_live() else None
+
+# How much history fetch_stock_data serves from the local candle store
+HISTORY_DAYS = 730
+
+# Process-wide price cache shared by every caller (and Streamlit session),
+# keyed by (symbol, provider, days_back)
+price_cache = TTLCache(
+    maxsize=int(os.getenv("PRICE_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("PRICE_CACHE_TTL", "300")),
+)
 
 
 # ===========================================
 #  FETCH FROM FINNHUB (candles)
 # ===========================================
-def fetch_from_finnhub(symbol, days_back=365):
-    """Try fetching historical data from Finnhub (candles)."""
-    try:
-        if not finnhub_client:
-            return None
+async def fetch_from_finnhub_async(symbol, days_back=365, min_records=50):
+    """Try fetching historical data from Finnhub (candles).
+
+    Skipped without a network call while the Finnhub circuit breaker for this
+    symbol (or for the candle endpoint as a whole) is open.
+    """
+    if not finnhub_client:
+        return None
+    if not provider_health.allow("finnhub", "candles", symbol):
+        print(f"⏭️ Finnhub candles circuit open for {symbol}, skipping")
+        return None
 
+    started = time.perf_counter()
+    try:
         end_time = int(datetime.now().timestamp())
         start_time = int((datetime.now() - timedelta(days=days_back)).timestamp())
 
-        res = finnhub_client.stock_candles(symbol, 'D', start_time, end_time)
+        res = await finnhub_client.stock_candles(symbol, 'D', start_time, end_time)
+        latency_ms = (time.perf_counter() - started) * 1000
         if res.get("s") != "ok":
             print(f"⚠️ Finnhub returned: {res.get('s')} for {symbol}")
+            # "no_data" is an answer about this symbol, not a provider failure
+            provider_health.record("finnhub", "candles", symbol, False, latency_ms, f"status {res.get('s')}",
+                                   no_data=res.get("s") == "no_data")
             return None
+        provider_health.record("finnhub", "candles", symbol, True, latency_ms)
 
-        df = pd.DataFrame(res)
-        df.rename(columns={'c': 'close', 'o': 'open', 'h': 'high',
-                           'l': 'low', 'v': 'volume', 't': 'timestamp'}, inplace=True)
-        df['date'] = pd.to_datetime(df['timestamp'], unit='s')
-        df = df.sort_values('date')
-
-        if len(df) < 50:  # Too few records
+        if len(res.get('c') or []) < min_records:  # Too few records
             return None
 
-        return df[['date', 'open', 'high', 'low', 'close', 'volume']]
+        return to_canonical(pd.DataFrame({
+            'date': pd.to_datetime(res['t'], unit='s'),
+            'open': res['o'], 'high': res['h'], 'low': res['l'],
+            'close': res['c'], 'volume': res['v'],
+        }), symbol, dtype=np.float64)
 
+    except asyncio.CancelledError:
+        provider_health.release("finnhub", "candles", symbol)
+        raise
     except Exception as e:
         print(f"❌ Finnhub error for {symbol}: {e}")
+        provider_health.record("finnhub", "candles", symbol, False,
+                               (time.perf_counter() - started) * 1000, str(e)[:200])
         return None
 
+
+def fetch_from_finnhub(symbol, days_back=365, min_records=50):
+    """Blocking wrapper around `fetch_from_finnhub_async`."""
+    return run_sync(fetch_from_finnhub_async(symbol, days_back, min_records))
+
 # ===========================================
 #  FETCH FROM YFINANCE (fallback)
 # ===========================================
-def fetch_from_yfinance(symbol, period="1y"):
-    """Fallback: Fetch data from Yahoo Finance."""
+def fetch_from_yfinance(symbol, period="1y", start=None):
+    """Fallback: Fetch data from Yahoo Finance (from `start` if given, else `period`)."""
+    started = time.perf_counter()
     try:
-        df = yf.download(symbol, period=period, interval="1d", progress=False)
-        if df.empty:
+        if start is not None:
+            df = run_sync(yfinance_download(symbol, start=start, interval="1d"))
+        else:
+            df = run_sync(yfinance_download(symbol, period=period, interval="1d"))
+        latency_ms = (time.perf_counter() - started) * 1000
+        if df is None or df.empty:
             print(f"⚠️ No data found for {symbol} using yfinance.")
+            provider_health.record("yfinance", "download", symbol, False, latency_ms, "empty frame")
             return None
 
-        df.reset_index(inplace=True)
-        df.rename(columns={'Date': 'date', 'Open': 'open', 'High': 'high',
-                           'Low': 'low', 'Close': 'close', 'Volume': 'volume'}, inplace=True)
-        df = df.sort_values('date')
-        return df[['date', 'open', 'high', 'low', 'close', 'volume']]
+        provider_health.record("yfinance", "download", symbol, True, latency_ms)
+        return _normalize_yfinance_frame(df, symbol)
 
     except Exception as e:
         print(f"❌ YFinance error for {symbol}: {e}")
+        provider_health.record("yfinance", "download", symbol, False,
+                               (time.perf_counter() - started) * 1000, str(e)[:200])
         return None
 
+
+def _normalize_yfinance_frame(df, symbol):
+    """Turn a yf.download frame (Date index, capitalized columns) into a canonical float64 frame."""
+    if isinstance(df.columns, pd.MultiIndex):
+        # Single-ticker downloads come back as (Price, Ticker) columns
+        df = df.droplevel(-1, axis=1)
+    df = df.reset_index()
+    df = df.rename(columns={'Date': 'date', 'Open': 'open', 'High': 'high',
+                            'Low': 'low', 'Close': 'close', 'Volume': 'volume'})
+    df = df.dropna(subset=['close'])
+    return to_canonical(df[OHLCV_COLUMNS], symbol, dtype=np.float64)
+
+
+def fetch_many_from_yfinance(symbols, period="2y", start=None):
+    """Fetch several tickers with a single multi-ticker yf.download call."""
+    started = time.perf_counter()
+    try:
+        if start is not None:
+            raw = run_sync(yfinance_download(symbols, start=start, interval="1d",
+                                             group_by="ticker", threads=True))
+        else:
+            raw = run_sync(yfinance_download(symbols, period=period, interval="1d",
+                                             group_by="ticker", threads=True))
+    except Exception as e:
+        print(f"❌ YFinance batch error for {symbols}: {e}")
+        raw = None
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    frames = {}
+    for symbol in symbols:
+        if raw is None or raw.empty:
+            df = None
+        elif isinstance(raw.columns, pd.MultiIndex):
+            df = raw[symbol] if symbol in raw.columns.get_level_values(0) else None
+        else:
+            df = raw
+        if df is not None:
+            df = _normalize_yfinance_frame(df, symbol)
+        if df is None or df.empty:
+            print(f"⚠️ No data found for {symbol} using yfinance.")
+            provider_health.record("yfinance", "download", symbol, False, latency_ms, "empty frame")
+            continue
+        provider_health.record("yfinance", "download", symbol, True, latency_ms)
+        frames[symbol] = df
+    return frames
+
 # ===========================================
 #  HYBRID FETCH FUNCTION
 # ===========================================
-def fetch_stock_data(symbol, days_back=365):
-    """Fetch stock data — try Finnhub first, then fallback to Yahoo Finance."""
-    print(f"\n📊 Fetching stock data for {symbol}...")
+def fetch_remote_stock_data(symbol, days_back=365, since=None):
+    """Fetch candles from the network — try Finnhub first, then fallback to Yahoo Finance.
+
+    With `since`, only bars from that date onwards are requested. Frames keep
+    the providers' float64 values (for the candle store); pass them through
+    `to_canonical` before handing them out.
+    """
+    if since is not None:
+        days_back = (datetime.now() - pd.Timestamp(since)).days + 1
 
     # 1️⃣ Try Finnhub
-    df = fetch_from_finnhub(symbol, days_back)
+    df = fetch_from_finnhub(symbol, days_back, min_records=1 if since is not None else 50)
     if df is not None and not df.empty:
         print(f"✅ Using Finnhub data for {symbol} ({len(df)} records)")
         return df
 
     # 2️⃣ Fallback to yfinance
-    df = fetch_from_yfinance(symbol, period="2y")
+    if since is not None:
+        df = fetch_from_yfinance(symbol, start=pd.Timestamp(since).strftime("%Y-%m-%d"))
+    else:
+        df = fetch_from_yfinance(symbol, period="2y")
     if df is not None and not df.empty:
         print(f"✅ Using Yahoo Finance data for {symbol} ({len(df)} records)")
         return df
 
     # 3️⃣ No data at all
     print(f"❌ Could not fetch data for {symbol} from either source.")
-    return pd.DataFrame()
+    return empty_frame(symbol)
+
+
+def fetch_stock_data(symbol, days_back=365, use_store=True):
+    """Fetch stock data through the process-wide price cache and local candle store.
+
+    Repeated and concurrent calls for the same symbol within the cache TTL
+    share one fetch. On a miss only bars newer than the last stored one are
+    downloaded; everything else is read from `data/stocksense.db`. Pass
+    `use_store=False` to go straight to the providers.
+
+    Returns a canonical frame (see ohlcv.py) that is shared with every other
+    caller through the cache: treat it as read-only and build derived columns
+    in a new frame. In record/replay
+    provider mode the candle store is bypassed so every call maps to one
+    deterministic provider request.
+    """
+    use_store = use_store and is_live()
+    key = (symbol, "store" if use_store else "remote", days_back)
+    df = price_cache.get_or_load(key, lambda: _fetch_stock_data(symbol, days_back, use_store))
+    if df.empty:
+        # Don't pin a failed fetch for a whole TTL
+        price_cache.invalidate(lambda k: k == key)
+    return df
+
+
+def _fetch_stock_data(symbol, days_back, use_store):
+    print(f"\n📊 Fetching stock data for {symbol}...")
+
+    if not use_store:
+        return to_canonical(fetch_remote_stock_data(symbol, days_back), symbol)
+
+    refresh, last_date = needs_refresh(symbol)
+    if refresh:
+        # Re-request the last stored bar too, it may have been saved mid-session
+        new_bars = fetch_remote_stock_data(symbol, days_back, since=last_date)
+        save_candles(symbol, new_bars)
+
+    since = datetime.now() - timedelta(days=max(days_back, HISTORY_DAYS))
+    df = load_candles(symbol, since=since)
+    if df.empty:
+        return df
+
+    print(f"💾 Using stored candles for {symbol} ({len(df)} records, last {df['date'].iloc[-1].date()})")
+    return df
+
+# ===========================================
+#  BATCHED MULTI-SYMBOL FETCH
+# ===========================================
+def fetch_remote_stock_data_many(symbols, days_back=365, since=None):
+    """Network fetch for many symbols at once.
+
+    Finnhub candle requests run concurrently (bounded and rate limited by the
+    provider client); whatever Finnhub can't serve is
+    fetched in one multi-ticker yfinance download. `since` maps symbol → first
+    date wanted (missing/None means full history). Frames are float64, as
+    with `fetch_remote_stock_data`.
+    """
+    since = since or {}
+    frames = {}
+
+    def _finnhub(symbol):
+        start = since.get(symbol)
+        window = (datetime.now() - pd.Timestamp(start)).days + 1 if start is not None else days_back
+        return fetch_from_finnhub_async(symbol, window, min_records=1 if start is not None else 50)
+
+    async def _gather():
+        return await asyncio.gather(*(_finnhub(symbol) for symbol in symbols))
+
+    # 1️⃣ Finnhub, concurrently
+    if finnhub_client and symbols:
+        for symbol, df in zip(symbols, run_sync(_gather())):
+            if df is not None and not df.empty:
+                frames[symbol] = df
+
+    # 2️⃣ One yfinance download for the rest
+    missing = [s for s in symbols if s not in frames]
+    if missing:
+        starts = [since.get(s) for s in missing]
+        if all(start is not None for start in starts):
+            yf_frames = fetch_many_from_yfinance(missing, start=min(starts).strftime("%Y-%m-%d"))
+        else:
+            yf_frames = fetch_many_from_yfinance(missing, period="2y")
+        for symbol, df in yf_frames.items():
+            start = since.get(symbol)
+            frames[symbol] = df[df['date'] >= start] if start is not None else df
+
+    for symbol in symbols:
+        if symbol not in frames:
+            print(f"❌ Could not fetch data for {symbol} from either source.")
+    return frames
+
+
+def fetch_stock_data_many(symbols, days_back=365, use_store=True):
+    """Fetch stock data for several symbols in one go.
+
+    Returns a dict of symbol → canonical frame (shared and read-only, as with
+    `fetch_stock_data`; empty frames for symbols nothing could be fetched for). Wall-clock time
+    scales with the slowest request rather than the number of symbols.
+    """
+    use_store = use_store and is_live()
+    provider = "store" if use_store else "remote"
+    result = {}
+    for symbol in dict.fromkeys(symbols):
+        cached = price_cache.get((symbol, provider, days_back))
+        if cached is not None:
+            result[symbol] = cached
+    symbols = [s for s in dict.fromkeys(symbols) if s not in result]
+    if not symbols:
+        return result
+    print(f"\n📊 Fetching stock data for {len(symbols)} symbols: {', '.join(symbols)}")
+
+    if not use_store:
+        frames = fetch_remote_stock_data_many(symbols, days_back)
+        for symbol in symbols:
+            df = frames.get(symbol)
+            if df is None:
+                df = empty_frame(symbol)
+            elif not df.empty:
+                df = to_canonical(df, symbol)
+                price_cache.put((symbol, provider, days_back), df)
+            result[symbol] = df
+        return result
+
+    stale = {}
+    for symbol in symbols:
+        refresh, last_date = needs_refresh(symbol)
+        if refresh:
+            stale[symbol] = last_date
+
+    if stale:
+        frames = fetch_remote_stock_data_many(list(stale), days_back, since=stale)
+        for symbol in stale:
+            save_candles(symbol, frames.get(symbol))
+
+    since = datetime.now() - timedelta(days=max(days_back, HISTORY_DAYS))
+    loaded = 0
+    for symbol in symbols:
+        df = load_candles(symbol, since=since)
+        result[symbol] = df
+        if df.empty:
+            continue
+        loaded += 1
+        price_cache.put((symbol, provider, days_back), df)
+    print(f"💾 Loaded stored candles for {loaded}/{len(symbols)} symbols ({len(stale)} refreshed)")
+    return result
+
+
+def get_price_cache_stats():
+    """Hit/miss/coalesced/eviction counters of the shared price cache."""
+    return price_cache.stats()
 
 # ===========================================
 #  GENERAL NEWS FETCH
@@ -103,7 +351,7 @@ def fetch_general_news(category='general', count=20):
         if not finnhub_client:
             return pd.DataFrame()
 
-        news = finnhub_client.general_news(category, min_id=0)
+        news = run_sync(finnhub_client.general_news(category, min_id=0))
         if not news:
             print("⚠️ No news found.")
             return pd.DataFrame()
@@ -124,8 +372,8 @@ def fetch_general_news(category='general', count=20):
 # ===========================================
 if __name__ == "__main__":
     symbols = ["AAPL", "MSFT", "GOOG", "TSLA"]
-    for sym in symbols:
-        df = fetch_stock_data(sym)
+    for sym, df in fetch_stock_data_many(symbols).items():
+        print(sym)
         print(df.head())
 
     print(fetch_general_news())
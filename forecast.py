@@ -0,0 +1,124 @@
+# forecast.py
+import argparse
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from cache import TTLCache
+from candle_store import bar_is_final
+from numpy_lstm import NumpyLSTM
+from prepare_data import latest_window, inverse_transform_close
+from predict import model_pool, model_version, load_model_metrics, _model_input
+
+MAX_HORIZON = 30
+
+# Monte-Carlo dropout paths per forecast and the width of the band drawn from them
+MC_SAMPLES = 100
+CONFIDENCE = 0.9
+
+# Forecasts keyed on (symbol, last bar, model version, settings): a new bar or
+# a retrained model makes a new key, so the TTL only bounds memory. Like the
+# prediction cache, only forecasts from final bars are kept.
+forecast_cache = TTLCache(maxsize=256, ttl=24 * 60 * 60)
+
+
+def mc_sampler(model):
+    """(fn(X, rng) → one prediction per window, stochastic?) for a loaded model.
+
+    NumPy and Keras models keep their Dropout layers on, so every call
+    draws a different network (Monte-Carlo dropout). Models without dropout
+    (ridge, TFLite) are deterministic.
+    """
+    if isinstance(model, NumpyLSTM):
+        return (lambda X, rng: model.predict(X, rng=rng)), model.has_dropout
+    if hasattr(model, "layers"):
+        import tensorflow as tf
+        fn = tf.function(lambda inputs: model(inputs, training=True), reduce_retracing=True)
+        stochastic = any(type(layer).__name__ == "Dropout" for layer in model.layers)
+        return (lambda X, rng: fn(X).numpy()), stochastic
+    return (lambda X, rng: np.asarray(model.predict(X))), False
+
+
+def rollout(sample, window, horizon, n_paths, rng=None):
+    """Recursive multi-step forecast of `n_paths` paths at once.
+
+    `window` is one scaled model input (1, time_steps, features). All paths
+    live in one buffer of time_steps + horizon rows; step h feeds the batch
+    of windows ending at row time_steps + h - 1 to the model in one call and
+    writes the predicted close into the next row. Feature columns other than
+    close are carried forward from the last bar. Returns scaled closes of
+    shape (n_paths, horizon).
+    """
+    _, time_steps, n_features = window.shape
+    buffer = np.empty((n_paths, time_steps + horizon, n_features), dtype=np.float32)
+    buffer[:, :time_steps] = window[0]
+    for h in range(horizon):
+        predicted = sample(buffer[:, h:h + time_steps], rng).reshape(-1)
+        buffer[:, time_steps + h] = buffer[:, time_steps + h - 1]
+        buffer[:, time_steps + h, 0] = predicted
+    return buffer[:, time_steps:, 0]
+
+
+def _forecast(entry, df, horizon, samples, confidence, rmse, seed):
+    sample, stochastic = mc_sampler(entry["model"])
+    window = latest_window(df, entry["scaler"], entry["time_steps"], entry["features"])
+    if window is None:
+        return None
+    paths = rollout(sample, window.astype(np.float32), horizon, samples if stochastic else 1,
+                    np.random.default_rng(seed))
+    prices = inverse_transform_close(entry["scaler"], paths).reshape(paths.shape)
+
+    tail = (1 - confidence) / 2
+    if stochastic:
+        mean = prices.mean(axis=0)
+        lower, upper = np.quantile(prices, [tail, 1 - tail], axis=0)
+    else:
+        # One deterministic path: widen the test RMSE like a random walk
+        mean = prices[0]
+        spread = NormalDist().inv_cdf(1 - tail) * (rmse or 0.0) * np.sqrt(np.arange(1, horizon + 1))
+        lower, upper = np.maximum(mean - spread, 0.0), mean + spread
+
+    dates = pd.bdate_range(pd.Timestamp(df['date'].iloc[-1]) + pd.Timedelta(days=1), periods=horizon)
+    return pd.DataFrame({"date": dates, "mean": mean, "lower": lower, "upper": upper})
+
+
+def forecast(symbol, horizon=10, samples=MC_SAMPLES, confidence=CONFIDENCE, df=None, pool=None, seed=0):
+    """Daily closes for the next `horizon` business days with a confidence band.
+
+    Returns a frame with date, mean, lower and upper (the `confidence`
+    interval over `samples` Monte-Carlo dropout paths), or None if `symbol`
+    has no model of its own or too little data. `df` optionally passes the
+    price frame. Results are cached per symbol, last bar and model version
+    once that bar is final.
+    """
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON} days")
+    entry = (pool or model_pool).get(symbol)
+    if entry is None:
+        print(f"⚠️ No model of its own for {symbol}; horizon forecasts need one.")
+        return None
+    df = _model_input(symbol, {symbol: df} if df is not None else {}, entry["features"])
+    if df is None:
+        return None
+
+    as_of = df['date'].iloc[-1]
+    def load():
+        return _forecast(entry, df, horizon, samples, confidence, load_model_metrics(symbol).get("rmse"), seed)
+    if not bar_is_final(symbol, as_of):
+        return load()
+    key = (symbol, str(pd.Timestamp(as_of).date()), model_version(symbol), horizon, samples, confidence, seed)
+    return forecast_cache.get_or_load(key, load)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-day forecasts with Monte-Carlo dropout bands")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--horizon", type=int, default=10, help=f"Business days ahead (1-{MAX_HORIZON})")
+    parser.add_argument("--samples", type=int, default=MC_SAMPLES, help="Monte-Carlo dropout paths")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    args = parser.parse_args()
+
+    for sym in args.symbols:
+        result = forecast(sym.upper(), args.horizon, args.samples, args.confidence)
+        if result is not None:
+            print(f"\n🔮 {sym.upper()} — {args.horizon}-day forecast ({args.confidence:.0%} band):")
+            print(result.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
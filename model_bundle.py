@@ -0,0 +1,196 @@
+# model_bundle.py
+import os
+import json
+import uuid
+import struct
+import argparse
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from numpy_lstm import NumpyLSTM
+
+# One file per published model version holding everything serving needs:
+#
+#   MAGIC | header length (uint64 LE) | JSON header | raw arrays
+#
+# The header carries the metrics, the MinMaxScaler parameters and the layer
+# table of the NumPy kernel (settings plus offset/shape/dtype of each weight
+# array). Arrays start on ALIGN-byte boundaries and are memory-mapped, not
+# read: loading parses a few KB of JSON, and processes serving the same
+# version share the file's pages through the OS page cache. No pickle.
+MAGIC = b"SSBUNDLE"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+# Fitted MinMaxScaler state
+SCALER_ARRAYS = ("min_", "scale_", "data_min_", "data_max_", "data_range_")
+
+
+def bundle_name(symbol):
+    return f"{symbol}.bundle"
+
+
+def bundle_path(symbol):
+    """Bundle of the version currently published for `symbol`, or None."""
+    from model_registry import current_version, version_dir
+
+    version = current_version(symbol)
+    if version is None:
+        return None
+    path = os.path.join(version_dir(symbol, version), bundle_name(symbol))
+    return path if os.path.exists(path) else None
+
+
+# ===========================================
+#  WRITE
+# ===========================================
+def _scaler_header(scaler):
+    header = {name: np.asarray(getattr(scaler, name), dtype=np.float64).tolist() for name in SCALER_ARRAYS}
+    header["feature_range"] = list(scaler.feature_range)
+    header["n_samples_seen_"] = int(scaler.n_samples_seen_)
+    header["n_features_in_"] = int(scaler.n_features_in_)
+    return header
+
+
+def write_bundle(path, model, scaler, metrics):
+    """Write a NumpyLSTM `model`, its MinMaxScaler and metrics dict to `path` (atomically)."""
+    layers, arrays, offset = [], [], 0
+    for layer in model.layer_dicts:
+        entry = {}
+        for key, value in layer.items():
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value, dtype=np.float32)
+                offset += -offset % ALIGN
+                entry[key] = {"offset": offset, "shape": list(value.shape), "dtype": value.dtype.str}
+                arrays.append((offset, value))
+                offset += value.nbytes
+            else:
+                entry[key] = value
+        layers.append(entry)
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "input_shape": list(model.input_shape),
+        "layers": layers,
+        "scaler": _scaler_header(scaler),
+        "metrics": metrics,
+    }).encode()
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += -data_start % ALIGN
+
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for array_offset, value in arrays:
+            f.seek(data_start + array_offset)
+            f.write(value.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def build_bundle(symbol, source_dir, path):
+    """Bundle the model, scaler and metrics files of `symbol` found in `source_dir`.
+
+    Returns `path`, or None if the model isn't one the NumPy kernel runs
+    (those keep being served from their own files).
+    """
+    import joblib
+    import backends
+
+    with open(os.path.join(source_dir, f"{symbol}_metrics.json")) as f:
+        metrics = json.load(f)
+    backend = metrics.get("backend", backends.DEFAULT_BACKEND)
+    model_file = os.path.join(source_dir, os.path.basename(backends.model_path(symbol, backend)))
+    scaler = joblib.load(os.path.join(source_dir, f"{symbol}_scaler.pkl"))
+    if not model_file.endswith(".h5") or not isinstance(scaler, MinMaxScaler):
+        return None
+    try:
+        model = NumpyLSTM.from_h5(model_file)
+    except NotImplementedError as e:
+        print(f"ℹ️ No bundle for {symbol} ({e} not supported by the NumPy kernel).")
+        return None
+    return write_bundle(path, model, scaler, metrics)
+
+
+# ===========================================
+#  READ
+# ===========================================
+def read_header(path):
+    """(header dict, offset of the array data) of a bundle file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path} has bundle format {header.get('format')}, expected {FORMAT_VERSION}")
+    data_start = len(MAGIC) + 8 + length
+    return header, data_start + (-data_start % ALIGN)
+
+
+def _scaler(state):
+    scaler = MinMaxScaler(feature_range=tuple(state["feature_range"]))
+    for name in SCALER_ARRAYS:
+        setattr(scaler, name, np.asarray(state[name], dtype=np.float64))
+    scaler.n_samples_seen_ = state["n_samples_seen_"]
+    scaler.n_features_in_ = state["n_features_in_"]
+    return scaler
+
+
+def read_bundle(path):
+    """{"model", "scaler", "metrics"} of a bundle file; weights are read-only memory maps."""
+    header, data_start = read_header(path)
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+
+    layers = []
+    for entry in header["layers"]:
+        layer = {}
+        for key, value in entry.items():
+            if isinstance(value, dict) and "offset" in value:
+                start = data_start + value["offset"]
+                count = int(np.prod(value["shape"])) * np.dtype(value["dtype"]).itemsize
+                value = raw[start:start + count].view(value["dtype"]).reshape(value["shape"])
+            layer[key] = value
+        layers.append(layer)
+
+    return {
+        "model": NumpyLSTM(layers, tuple(header["input_shape"])),
+        "scaler": _scaler(header["scaler"]),
+        "metrics": header["metrics"],
+    }
+
+
+def load_bundle(symbol):
+    """Bundle of the current version of `symbol` (see read_bundle), or None if there is none.
+
+    Unreadable bundles also give None; callers fall back to the separate files.
+    """
+    path = bundle_path(symbol)
+    if path is None:
+        return None
+    try:
+        return read_bundle(path)
+    except ValueError as e:
+        print(f"⚠️ {e}. Loading the separate model files.")
+        return None
+
+
+def load_bundle_metrics(symbol):
+    """Metrics from the bundle header of `symbol` without mapping its weights, or None."""
+    path = bundle_path(symbol)
+    if path is None:
+        return None
+    try:
+        return read_header(path)[0]["metrics"]
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    # Models published before bundles existed get one when published again
+    import model_registry
+
+    parser = argparse.ArgumentParser(description="Write model bundles by publishing the working model files")
+    parser.add_argument("symbols", nargs="+")
+    args = parser.parse_args()
+    for sym in args.symbols:
+        model_registry.publish(sym.upper())
@@ -0,0 +1,283 @@
+# model_registry.py
+import os
+import json
+import time
+import uuid
+import atexit
+import shutil
+import hashlib
+import argparse
+import threading
+from collections import Counter
+import pandas as pd
+from datetime import datetime
+from db import get_connection, init_db
+import model_bundle
+
+# train.py and retrain.py write a symbol's model, scaler and metrics to their
+# working paths in models/ and then publish them: the files are copied into
+# an immutable version directory named after a hash of their contents, and
+# the symbol's CURRENT pointer is switched to it with one atomic rename.
+# Serving code loads the files of the current version (see resolve), so it
+# never sees a half-written model, and compares versions to hot-reload.
+# Versions of NumPy-kernel models also get a single-file bundle.
+#
+#   models/registry/{symbol}/CURRENT
+#   models/registry/{symbol}/{version}/{symbol}_lstm_model.h5 ... {symbol}.bundle
+#
+# TFLite exports and their validation reports are published with the model
+# they were converted from.
+REGISTRY_DIR = os.path.join("models", "registry")
+
+# Versions kept per symbol (older ones are deleted when a new one is published)
+KEEP_VERSIONS = 10
+
+# Request counts are kept in memory and added to model_usage at most this often
+USAGE_FLUSH_SECONDS = 60
+
+_initialized = False
+
+_usage = Counter()
+_usage_lock = threading.Lock()
+_usage_flushed = time.monotonic()
+
+
+def _ensure_tables():
+    global _initialized
+    if not _initialized:
+        init_db()
+        _initialized = True
+
+
+def _symbol_dir(symbol):
+    return os.path.join(REGISTRY_DIR, symbol)
+
+
+def version_dir(symbol, version):
+    return os.path.join(_symbol_dir(symbol), version)
+
+
+# ===========================================
+#  READ
+# ===========================================
+def current_version(symbol):
+    """Published version serving `symbol`, or None. One small file read."""
+    try:
+        with open(os.path.join(_symbol_dir(symbol), "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve(symbol, path):
+    """Copy of the working file `path` in the current version of `symbol`.
+
+    Falls back to `path` itself for symbols (or files) never published.
+    """
+    version = current_version(symbol)
+    if version is not None:
+        published = os.path.join(version_dir(symbol, version), os.path.basename(path))
+        if os.path.exists(published):
+            return published
+    return path
+
+
+def history(symbol):
+    """Published versions of `symbol`, oldest first, with the retrain that produced each."""
+    _ensure_tables()
+    conn = get_connection()
+    df = pd.read_sql_query(
+        """
+        SELECT v.version, v.backend, v.published_at, r.retrain_time, r.cutoff_date, r.notes
+        FROM model_versions v
+        LEFT JOIN retrain_logs r ON r.symbol = v.symbol AND r.model_version = v.version
+        WHERE v.symbol = ?
+        ORDER BY v.published_at
+        """,
+        conn, params=(symbol,),
+    )
+    conn.close()
+    df["current"] = df["version"] == current_version(symbol)
+    return df
+
+
+# ===========================================
+#  USAGE
+# ===========================================
+def note_use(symbols):
+    """Count a request for each of `symbols`.
+
+    Counts are added to model_usage every USAGE_FLUSH_SECONDS and at exit.
+    """
+    global _usage_flushed
+    with _usage_lock:
+        _usage.update(symbols)
+        due = time.monotonic() - _usage_flushed >= USAGE_FLUSH_SECONDS
+        if due:
+            _usage_flushed = time.monotonic()
+    if due:
+        flush_usage()
+
+
+def flush_usage():
+    """Add the request counts gathered in this process to model_usage."""
+    with _usage_lock:
+        counts = dict(_usage)
+        _usage.clear()
+    if not counts:
+        return
+    _ensure_tables()
+    now = datetime.now().isoformat()
+    conn = get_connection()
+    conn.executemany(
+        """
+        INSERT INTO model_usage (symbol, requests, last_used) VALUES (?, ?, ?)
+        ON CONFLICT(symbol) DO UPDATE SET
+            requests = requests + excluded.requests, last_used = excluded.last_used
+        """,
+        [(symbol, count, now) for symbol, count in counts.items()],
+    )
+    conn.commit()
+    conn.close()
+
+
+def most_used(limit):
+    """Up to `limit` symbols with the most requests, most first (what serving processes preload)."""
+    if limit <= 0:
+        return []
+    flush_usage()
+    _ensure_tables()
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT symbol FROM model_usage ORDER BY requests DESC, last_used DESC LIMIT ?", (limit,)
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+atexit.register(flush_usage)
+
+
+# ===========================================
+#  PUBLISH
+# ===========================================
+def _artifacts(symbol):
+    """(backend, working files) making up the model of `symbol`; no files if it has no model."""
+    import backends
+    import tflite_export
+
+    metrics_path = os.path.join("models", f"{symbol}_metrics.json")
+    backend = backends.DEFAULT_BACKEND
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            backend = json.load(f).get("backend", backend)
+    model_path = backends.model_path(symbol, backend)
+    if not os.path.exists(model_path):
+        return backend, []
+    paths = [model_path, os.path.join("models", f"{symbol}_scaler.pkl"), metrics_path]
+    # A TFLite export goes with the model only if it was made from it
+    export = tflite_export.tflite_path(symbol, backend)
+    if os.path.exists(export) and os.path.getmtime(export) >= os.path.getmtime(model_path):
+        paths += [export, tflite_export.report_path(symbol)]
+    return backend, [p for p in paths if os.path.exists(p)]
+
+
+def _content_hash(paths):
+    digest = hashlib.sha256()
+    for path in sorted(paths, key=os.path.basename):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _bundle(symbol, directory):
+    """Add the single-file bundle (model_bundle.py) to a version directory."""
+    if all(os.path.exists(os.path.join(directory, f"{symbol}_{kind}")) for kind in ("scaler.pkl", "metrics.json")):
+        model_bundle.build_bundle(symbol, directory, os.path.join(directory, model_bundle.bundle_name(symbol)))
+
+
+def activate(symbol, version):
+    """Point `symbol` at an already published `version` (atomic; also rolls back)."""
+    if not os.path.isdir(version_dir(symbol, version)):
+        raise ValueError(f"{symbol} has no published version {version!r}")
+    pointer = os.path.join(_symbol_dir(symbol), "CURRENT")
+    tmp = f"{pointer}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, pointer)
+
+
+def publish(symbol):
+    """Publish the working model files of `symbol` and make them current.
+
+    Returns the version (None if `symbol` has no trained model). Publishing
+    files identical to an existing version just points back at it.
+    """
+    backend, paths = _artifacts(symbol)
+    if not paths:
+        print(f"⚠️ No trained model to publish for {symbol}.")
+        return None
+    version = _content_hash(paths)
+    target = version_dir(symbol, version)
+
+    if not os.path.isdir(target):
+        # Fill a private directory, then rename it into place in one step
+        staging = os.path.join(_symbol_dir(symbol), f".staging-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        for path in paths:
+            shutil.copy2(path, staging)
+        _bundle(symbol, staging)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)  # published concurrently
+            if not os.path.isdir(target):
+                raise
+    elif not os.path.exists(os.path.join(target, model_bundle.bundle_name(symbol))):
+        _bundle(symbol, target)  # published before bundles existed
+    activate(symbol, version)
+
+    _ensure_tables()
+    conn = get_connection()
+    conn.execute(
+        "INSERT OR IGNORE INTO model_versions (symbol, version, backend, published_at) VALUES (?, ?, ?, ?)",
+        (symbol, version, backend, datetime.now().isoformat()),
+    )
+    conn.commit()
+    conn.close()
+
+    prune(symbol)
+    print(f"🏷️ Published {symbol} model version {version}")
+    return version
+
+
+def prune(symbol, keep=KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions of `symbol` (never the current one)."""
+    root = _symbol_dir(symbol)
+    if not os.path.isdir(root):
+        return []
+    current = current_version(symbol)
+    versions = sorted((e for e in os.scandir(root) if e.is_dir() and not e.name.startswith(".")),
+                      key=lambda e: e.stat().st_mtime, reverse=True)
+    removed = [e.name for e in versions[keep:] if e.name != current]
+    for version in removed:
+        shutil.rmtree(version_dir(symbol, version), ignore_errors=True)
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Published model versions")
+    parser.add_argument("symbol")
+    parser.add_argument("--publish", action="store_true", help="Publish the working model files")
+    parser.add_argument("--activate", metavar="VERSION", help="Serve an earlier version again")
+    args = parser.parse_args()
+
+    symbol = args.symbol.upper()
+    if args.publish:
+        publish(symbol)
+    if args.activate:
+        activate(symbol, args.activate)
+        print(f"🔁 {symbol} now serves version {args.activate}")
+    print(history(symbol).to_string(index=False))
@@ -1,14 +1,53 @@
 # monitor.py
+import os
+import numpy as np
 import pandas as pd
 from sklearn.metrics import mean_squared_error, accuracy_score
 from datetime import datetime
+from provider_health import get_provider_stats
+from finnhub_client import fetch_stock_data
+import prediction_cache
+
+def cached_outcomes(symbol):
+    """Predictions from the prediction cache next to the closes that followed.
+
+    One row per predicted bar that already has its next bar: as_of,
+    predicted_price, last_close (of the as_of bar) and actual_price.
+    """
+    history = prediction_cache.history(symbol)
+    if history.empty:
+        return history
+    candles = fetch_stock_data(symbol)
+    if candles.empty:
+        return candles
+    dates = pd.to_datetime(candles['date']).to_numpy()
+    closes = candles['close'].to_numpy()
+
+    nxt = dates.searchsorted(history['as_of'].to_numpy(), side='right')
+    known = (nxt > 0) & (nxt < len(dates))
+    history, nxt = history[known], nxt[known]
+    return pd.DataFrame({
+        "as_of": history['as_of'].to_numpy(),
+        "predicted_price": history['predicted_price'].to_numpy(),
+        "last_close": closes[nxt - 1],
+        "actual_price": closes[nxt],
+    })
+
 
 def evaluate_model(symbol):
-    pred = pd.read_csv(f"predictions/{symbol}.csv")
-    actual = pd.read_csv(f"actuals/{symbol}.csv")
+    outcomes = cached_outcomes(symbol)
+    if not outcomes.empty:
+        # Predictions the pipeline already made and stored: score them
+        # against the closes that followed, direction taken from the last close
+        rmse = float(np.sqrt(mean_squared_error(outcomes['actual_price'], outcomes['predicted_price'])))
+        accuracy = accuracy_score(outcomes['actual_price'] > outcomes['last_close'],
+                                  outcomes['predicted_price'] > outcomes['last_close'])
+    else:
+        pred = pd.read_csv(f"predictions/{symbol}.csv")
+        actual = pd.read_csv(f"actuals/{symbol}.csv")
 
-    rmse = mean_squared_error(actual['price'], pred['price'], squared=False)
-    accuracy = accuracy_score(actual['direction'], pred['direction'])
+        rmse = mean_squared_error(actual['price'], pred['price'], squared=False)
+        accuracy = accuracy_score(actual['direction'], pred['direction'])
     drift = accuracy < 0.80
 
     log = pd.DataFrame([{
@@ -19,4 +58,15 @@ def evaluate_model(symbol):
         "drift": drift
     }])
     log.to_csv("logs/performance_log.csv", mode='a', header=not pd.io.common.file_exists("logs/performance_log.csv"), index=False)
-    return drift
\ No newline at end of file
+    return drift
+
+
+def log_provider_stats():
+    """Append a snapshot of provider health (success rate, latency, breaker state)."""
+    stats = pd.DataFrame(get_provider_stats())
+    if stats.empty:
+        return stats
+    stats.insert(0, "timestamp", datetime.now())
+    os.makedirs("logs", exist_ok=True)
+    stats.to_csv("logs/provider_stats.csv", mode='a', header=not pd.io.common.file_exists("logs/provider_stats.csv"), index=False)
+    return stats
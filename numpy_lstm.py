@@ -0,0 +1,178 @@
+# numpy_lstm.py
+import os
+import json
+import numpy as np
+
+# Keras activations the kernel implements
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    # 1 / (1 + e^-x), written with tanh so large |x| can't overflow
+    "sigmoid": lambda x: 0.5 * (np.tanh(0.5 * x) + 1.0),
+    "hard_sigmoid": lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+    "relu": lambda x: np.maximum(x, 0.0),
+}
+
+# Layers with no effect at inference time
+PASSTHROUGH_LAYERS = {"InputLayer"}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise NotImplementedError(f"activation {name!r}")
+    return name
+
+
+def _layer_weights(group):
+    """Weight arrays of one layer group of an .h5 file, in Keras' order."""
+    names = [n.decode() if isinstance(n, bytes) else n for n in group.attrs.get("weight_names", [])]
+    return [np.asarray(group[n], dtype=np.float32) for n in names]
+
+
+def lstm_forward(x, layer):
+    """Run one LSTM layer over x of shape (batch, time, features).
+
+    The input projection of every time step is one matrix product up front;
+    only the recurrent product is left in the loop over time. Gate order
+    follows Keras: input, forget, cell, output.
+    """
+    batch, steps, _ = x.shape
+    units = layer["units"]
+    act, recurrent_act = ACTIVATIONS[layer["activation"]], ACTIVATIONS[layer["recurrent_activation"]]
+    if layer["go_backwards"]:
+        x = x[:, ::-1]
+
+    projected = x @ layer["kernel"] + layer["bias"]  # (batch, time, 4 * units)
+    h = np.zeros((batch, units), dtype=np.float32)
+    c = np.zeros((batch, units), dtype=np.float32)
+    outputs = np.empty((batch, steps, units), dtype=np.float32) if layer["return_sequences"] else None
+
+    for t in range(steps):
+        z = projected[:, t] + h @ layer["recurrent_kernel"]
+        i = recurrent_act(z[:, :units])
+        f = recurrent_act(z[:, units:2 * units])
+        g = act(z[:, 2 * units:3 * units])
+        o = recurrent_act(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * act(c)
+        if outputs is not None:
+            outputs[:, t] = h
+    return outputs if outputs is not None else h
+
+
+def dense_forward(x, layer):
+    return ACTIVATIONS[layer["activation"]](x @ layer["kernel"] + layer["bias"])
+
+
+# Layer kind → forward function. Layers are plain dicts of settings and
+# weight arrays (see model_bundle.py, which stores them as they are).
+FORWARD = {"LSTM": lstm_forward, "Dense": dense_forward}
+
+
+class NumpyLSTM:
+    """NumPy-only forward pass of a Sequential LSTM/Dense model saved as .h5.
+
+    Reads the architecture and weights with h5py and needs no TensorFlow.
+    `predict` takes a batch of windows (batch, time_steps, features) like
+    Keras' and matches its outputs to float32 rounding. Passing `rng` keeps
+    the Dropout layers active (Monte-Carlo dropout), drawing masks from it.
+    """
+
+    def __init__(self, layers, input_shape):
+        self._layers = layers
+        self.input_shape = input_shape
+
+    @classmethod
+    def from_h5(cls, path):
+        """Load a model written by `model.save(...h5)`.
+
+        Raises NotImplementedError if it uses a layer or activation the
+        kernel doesn't implement (serve it with Keras then).
+        """
+        import h5py
+
+        with h5py.File(path, "r") as f:
+            config = json.loads(f.attrs["model_config"])
+            if config["class_name"] != "Sequential":
+                raise NotImplementedError(f"{config['class_name']} models")
+            weights = f["model_weights"]
+
+            layers, input_shape = [], None
+            for spec in config["config"]["layers"]:
+                kind, cfg = spec["class_name"], spec["config"]
+                shape = cfg.get("batch_shape") or cfg.get("batch_input_shape")
+                if input_shape is None and shape:
+                    input_shape = tuple(shape)
+                if kind in PASSTHROUGH_LAYERS:
+                    continue
+                params = _layer_weights(weights[cfg["name"]])
+                if kind == "Dropout":
+                    layers.append({"kind": kind, "rate": float(cfg["rate"])})
+                elif kind == "LSTM":
+                    kernel, recurrent_kernel, bias = params if cfg.get("use_bias", True) else (
+                        *params, np.zeros(params[0].shape[1], dtype=np.float32))
+                    layers.append({
+                        "kind": kind,
+                        "units": cfg["units"],
+                        "kernel": kernel,
+                        "recurrent_kernel": recurrent_kernel,
+                        "bias": bias,
+                        "activation": _activation(cfg.get("activation", "tanh")),
+                        "recurrent_activation": _activation(cfg.get("recurrent_activation", "sigmoid")),
+                        "return_sequences": cfg.get("return_sequences", False),
+                        "go_backwards": cfg.get("go_backwards", False),
+                    })
+                elif kind == "Dense":
+                    kernel, bias = params if cfg.get("use_bias", True) else (
+                        *params, np.zeros(params[0].shape[1], dtype=np.float32))
+                    layers.append({
+                        "kind": kind,
+                        "kernel": kernel,
+                        "bias": bias,
+                        "activation": _activation(cfg.get("activation", "linear")),
+                    })
+                else:
+                    raise NotImplementedError(f"{kind} layers")
+
+        if input_shape is None:
+            first = next(layer for layer in layers if "kernel" in layer)
+            input_shape = (None, None, first["kernel"].shape[0])
+        return cls(layers, input_shape)
+
+    def predict(self, X, rng=None, **kwargs):
+        x = np.asarray(X, dtype=np.float32)
+        for layer in self._layers:
+            if layer["kind"] == "Dropout":
+                if rng is not None and layer["rate"] > 0:
+                    keep = rng.random(x.shape, dtype=np.float32) >= layer["rate"]
+                    x = x * keep / np.float32(1 - layer["rate"])
+                continue
+            x = FORWARD[layer["kind"]](x, layer)
+        return x
+
+    @property
+    def layer_dicts(self):
+        """Layers as dicts of settings and weight arrays (what model_bundle stores)."""
+        return self._layers
+
+    @property
+    def has_dropout(self):
+        return any(layer.get("rate", 0) > 0 for layer in self._layers)
+
+    def count_params(self):
+        return int(sum(v.size for layer in self._layers for v in layer.values() if isinstance(v, np.ndarray)))
+
+
+def load_numpy_forecaster(symbol, backend="lstm"):
+    """NumpyLSTM for the trained `backend` model of `symbol`, or None if missing or unsupported."""
+    from backends import model_path
+    from model_registry import resolve
+
+    path = resolve(symbol, model_path(symbol, backend))
+    if not path.endswith(".h5") or not os.path.exists(path):
+        return None
+    try:
+        return NumpyLSTM.from_h5(path)
+    except NotImplementedError as e:
+        print(f"ℹ️ NumPy kernel can't run {path} ({e} not supported). Using Keras.")
+        return None
@@ -0,0 +1,74 @@
+# ohlcv.py
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+OHLCV_COLUMNS = ['date'] + PRICE_COLUMNS
+
+
+def epoch_days(dates):
+    """int64 days since 1970-01-01 for an array of datetimes."""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def to_canonical(df, symbol=None, dtype=np.float32):
+    """Canonical in-memory daily candle frame shared by every module.
+
+    - index: int64 epoch day (named 'day'), sorted and unique
+    - 'date': datetime64 (midnight of the bar's day)
+    - 'open'..'volume': contiguous float32 columns
+    - 'symbol': categorical (a single category, so one byte per row)
+
+    Accepts provider frames in any of our raw layouts (yfinance MultiIndex
+    columns, extra Finnhub columns). Frames that are already canonical are
+    returned as is. Provider frames bound for the candle store are built with
+    `dtype=np.float64` so the stored prices and volumes keep full precision.
+    """
+    if is_canonical(df, dtype):
+        return df
+    if df is None or df.empty:
+        return empty_frame(symbol)
+
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+
+    dates = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]')
+    order = np.argsort(dates, kind='stable')
+    days = dates[order]
+    # Keep the last bar when a day appears twice (re-fetched partial session)
+    keep = np.append(days[1:] != days[:-1], True)
+    order, days = order[keep], days[keep]
+
+    data = {'date': days.astype('datetime64[ns]')}
+    for column in PRICE_COLUMNS:
+        data[column] = np.ascontiguousarray(df[column].to_numpy(dtype=dtype)[order])
+    data['symbol'] = pd.Categorical.from_codes(
+        np.zeros(len(days), dtype=np.int8), categories=[symbol or ''])
+
+    return pd.DataFrame(data, index=pd.Index(days.astype(np.int64), name='day'))
+
+
+def is_canonical(df, dtype=np.float32):
+    return (
+        df is not None
+        and df.index.name == 'day'
+        and df.index.dtype == np.int64
+        and 'symbol' in df.columns
+        and all(df[c].dtype == dtype for c in PRICE_COLUMNS if c in df.columns)
+    )
+
+
+def empty_frame(symbol=None):
+    """An empty canonical frame (what fetchers return when nothing could be loaded)."""
+    data = {'date': np.empty(0, dtype='datetime64[ns]')}
+    for column in PRICE_COLUMNS:
+        data[column] = np.empty(0, dtype=np.float32)
+    data['symbol'] = pd.Categorical([], categories=[symbol or ''])
+    return pd.DataFrame(data, index=pd.Index(np.empty(0, dtype=np.int64), name='day'))
+
+
+def memory_usage(df):
+    """Bytes used by a candle frame including its index."""
+    return int(df.memory_usage(index=True, deep=True).sum())
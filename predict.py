@@ -1,71 +1,403 @@
 # predict.py
 import os
+import sys
+import json
+import threading
 import joblib
 import numpy as np
 import pandas as pd
 from datetime import datetime
-from keras.models import load_model
-from finnhub_client import fetch_stock_data
+from finnhub_client import fetch_stock_data, fetch_stock_data_many
+from feature_store import get_features
+from prepare_data import feature_list, latest_window, inverse_transform_close
+import backends
+import prediction_cache
+import model_registry
+from backends import load_forecaster, DEFAULT_BACKEND, GLOBAL_MODEL_PATH, GLOBAL_SCALERS_PATH, GLOBAL_METRICS_PATH
+from numpy_lstm import load_numpy_forecaster
+from model_bundle import load_bundle, load_bundle_metrics
+from tflite_export import load_tflite_forecaster, TFLiteForecaster
+from cache import ModelCache
+
+# Runtime serving per-symbol models:
+#   numpy:  numpy_lstm kernel for LSTM .h5 models (from their memory-mapped
+#           bundle once published), no TensorFlow import
+#   keras:  the saved Keras model
+#   tflite: exports made with train.py --export-tflite
+# Models a runtime can't serve fall back to Keras.
+RUNTIMES = ("numpy", "keras", "tflite")
+SERVING_RUNTIME = os.getenv("STOCKSENSE_RUNTIME", "numpy")
+
+# Budget of the models a ModelPool keeps loaded; past it the least recently
+# used (policy "lfu": least used) are dropped and reloaded on demand
+MODEL_CACHE_ENTRIES = int(os.getenv("STOCKSENSE_MODEL_CACHE_ENTRIES", "64"))
+MODEL_CACHE_MB = float(os.getenv("STOCKSENSE_MODEL_CACHE_MB", "512"))
+MODEL_CACHE_POLICY = os.getenv("STOCKSENSE_MODEL_CACHE_POLICY", "lru")
+FRAMEWORK_OVERHEAD_BYTES = 4 * 1024 * 1024
+
+# Most-requested symbols (model_registry.most_used) serving processes load at startup (0: none)
+PRELOAD_MODELS = int(os.getenv("STOCKSENSE_PRELOAD_MODELS", "0"))
 
 # ---------- Utility functions ----------
 def load_scaler(symbol):
-    scaler_path = f"models/{symbol}_scaler.pkl"
+    scaler_path = model_registry.resolve(symbol, f"models/{symbol}_scaler.pkl")
     if not os.path.exists(scaler_path):
         raise FileNotFoundError(f"Scaler not found for {symbol}. Train first using train.py.")
-    with open(scaler_path, "rb") as f:
-        return joblib.load(scaler_path)
+    return joblib.load(scaler_path)
 
 
+def load_model_metrics(symbol):
+    """Metrics file written by train.py for `symbol` ({} if there is none)."""
+    metrics = load_bundle_metrics(symbol)
+    if metrics is not None:
+        return metrics
+    metrics_path = model_registry.resolve(symbol, f"models/{symbol}_metrics.json")
+    if not os.path.exists(metrics_path):
+        return {}
+    with open(metrics_path) as f:
+        return json.load(f)
 
-def predict_future(symbol, time_steps=60):
-    """Load model+scaler for `symbol`, fetch recent data, and predict next close."""
-    model_path = f"models/{symbol}_lstm_model.h5"
-    if not os.path.exists(model_path):
-        print(f"⚠️ Model not found for {symbol}. Skipping...")
+
+def load_model_backend(symbol):
+    """Backend (lstm, gru, conv1d, ridge) of the model trained for `symbol`."""
+    return load_model_metrics(symbol).get("backend", DEFAULT_BACKEND)
+
+
+def load_model_features(symbol):
+    """Input columns the model was trained on (recorded in its metrics file)."""
+    return feature_list(load_model_metrics(symbol).get("features"))
+
+
+def _file_version(prefix, path):
+    if not os.path.exists(path):
         return None
+    stat = os.stat(path)
+    return f"{prefix}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def model_version(symbol, use_global=False):
+    """Version of the model serving `symbol` (None if there is none).
+
+    That is its own model — the version published in the model registry,
+    or a tag of the model file if it was never published — or the global
+    model if it has none (or with `use_global`). Changes whenever train.py
+    or retrain.py writes a new model, so results keyed on it go stale with
+    the model.
+    """
+    if not use_global:
+        version = model_registry.current_version(symbol)
+        if version is not None:
+            return version
+        backend = load_model_backend(symbol)
+        version = _file_version(backend, backends.model_path(symbol, backend))
+        if version is not None:
+            return version
+    return _file_version("global", GLOBAL_MODEL_PATH)
+
+
+def load_serving_model(symbol, runtime=None):
+    """Model serving `symbol` in `runtime` (default SERVING_RUNTIME), or None if untrained."""
+    backend = load_model_backend(symbol)
+    runtime = runtime or SERVING_RUNTIME
+    model = None
+    if runtime == "numpy" and backends.is_keras_backend(backend):
+        bundle = load_bundle(symbol)
+        model = bundle["model"] if bundle is not None else load_numpy_forecaster(symbol, backend)
+    elif runtime == "tflite":
+        model = load_tflite_forecaster(symbol, backend)
+    return model if model is not None else load_forecaster(symbol, backend)
+
+
+# ---------- Warm model pool ----------
+def model_nbytes(model):
+    """Estimated memory held by a loaded model, for the pool's budget.
+
+    Weights take 4 bytes per parameter. A Keras model or TFLite interpreter
+    adds its framework state on top (graph, traced functions, tensor arena),
+    measured at about FRAMEWORK_OVERHEAD_BYTES for our LSTMs.
+    """
+    if isinstance(model, TFLiteForecaster):
+        return os.path.getsize(model.path) + FRAMEWORK_OVERHEAD_BYTES
+    weights = model.count_params() * 4
+    return weights + FRAMEWORK_OVERHEAD_BYTES if hasattr(model, "layers") else weights
+
+
+def compiled_forward(model):
+    """Inference callable for a loaded model.
+
+    Keras models are called directly (`model(x, training=False)`) inside a
+    traced tf.function, which skips the per-call setup of `model.predict`;
+    other backends (ridge, NumPy, TFLite) use their own `predict`.
+    """
+    if not hasattr(model, "layers"):
+        return lambda inputs: np.asarray(model.predict(inputs))
+    import tensorflow as tf
+    fn = tf.function(lambda inputs: model(inputs, training=False), reduce_retracing=True)
+    return lambda inputs: fn(inputs).numpy()
+
+
+class ModelPool:
+    """Models, scalers and compiled forward functions, loaded once per process and kept warm.
+
+    Every lookup compares the loaded version with the one currently
+    published (see model_version) and swaps in a retrained model without
+    a restart; unchanged models are never reloaded. Per-symbol models live
+    in a bounded cache.ModelCache (entries and MB), so memory stays flat
+    however many symbols are requested.
+    """
+
+    def __init__(self, runtime=None, max_entries=None, max_mb=None, policy=None):
+        self.runtime = runtime or SERVING_RUNTIME
+        if self.runtime not in RUNTIMES:
+            raise ValueError(f"Unknown runtime {self.runtime!r}, choose from {', '.join(RUNTIMES)}")
+        max_mb = MODEL_CACHE_MB if max_mb is None else max_mb
+        self.cache = ModelCache(
+            max_entries=MODEL_CACHE_ENTRIES if max_entries is None else max_entries,
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+            policy=policy or MODEL_CACHE_POLICY,
+            sizeof=lambda entry: model_nbytes(entry["model"]),
+        )
+        self._global = None
+        self._lock = threading.Lock()
+
+    def get(self, symbol):
+        """Loaded per-symbol model entry, or None if `symbol` has no trained model."""
+        version = model_version(symbol)
+        return self.cache.get_or_load(symbol, lambda: self._load(symbol, version), version)
+
+    def preload(self, symbols):
+        """Load `symbols` ahead of their first request (as many as the budget keeps)."""
+        loaded = [symbol for symbol in symbols if self.get(symbol) is not None]
+        stats = self.cache.stats()
+        print(f"🔥 Preloaded {len(loaded)} models ({stats['entries']} kept, {stats['bytes'] / 1e6:.1f} MB)")
+        return loaded
+
+    def _load(self, symbol, version):
+        if symbol in self.cache:
+            print(f"🔄 Reloading {symbol} model (version {version})")
+        bundle = load_bundle(symbol) if self.runtime == "numpy" else None
+        if bundle is not None:
+            # Model, scaler and metrics from one memory-mapped file
+            model, scaler, metrics = bundle["model"], bundle["scaler"], bundle["metrics"]
+        else:
+            model = load_serving_model(symbol, self.runtime)
+            if model is None:
+                return None
+            scaler, metrics = load_scaler(symbol), load_model_metrics(symbol)
+        return {
+            "model": model,
+            "scaler": scaler,
+            "features": feature_list(metrics.get("features")),
+            "time_steps": model.input_shape[1],
+            "forward": compiled_forward(model),
+            "version": version,
+        }
+
+    def get_global(self):
+        """Loaded global multi-symbol model entry, or None if it isn't trained."""
+        with self._lock:
+            version = _file_version("global", GLOBAL_MODEL_PATH)
+            if self._global is None or self._global["version"] != version:
+                loaded = load_global_model()
+                if loaded is None:
+                    self._global = None
+                    return None
+                model, scalers, metrics = loaded
+                self._global = {
+                    "version": version,
+                    "model": model,
+                    "scalers": scalers,
+                    "ids": {symbol: i for i, symbol in enumerate(metrics["symbols"])},
+                    "features": feature_list(metrics.get("features")),
+                    "time_steps": metrics.get("time_steps", 60),
+                    "forward": compiled_forward(model),
+                }
+            return self._global
+
+    def clear(self):
+        self.cache.clear()
+        with self._lock:
+            self._global = None
 
-    model = load_model(model_path)
-    scaler = load_scaler(symbol)
 
-    df = fetch_stock_data(symbol)
+# Shared by every caller in this process
+model_pool = ModelPool()
+
+
+def _model_input(symbol, frames, features):
+    """Price (or feature) frame for `symbol`, or None if there is no usable data."""
+    df = frames.get(symbol)
+    if df is None:
+        df = fetch_stock_data(symbol)
     if df.empty or 'close' not in df.columns:
         print(f"⚠️ No valid data for {symbol}. Skipping...")
         return None
+    if len(features) > 1:
+        df = get_features(symbol, df)
+    return df
+
+
+# ---------- Batch prediction engine ----------
+def predict_many(symbols, frames=None, use_global=False, pool=None, time_steps=60):
+    """Predict the next close for every symbol in `symbols`.
+
+    Models come from the warm `pool`. Symbols with their own model run one
+    compiled forward pass each; the rest (or all of them with `use_global`)
+    are served by the global model in a single batched pass. `frames`
+    optionally maps symbol → price frame (e.g. from fetch_stock_data_many).
+    Returns {symbol: predicted price} in the order of `symbols`.
+    """
+    pool = pool or model_pool
+    frames = frames or {}
+    predictions, shared = {}, []
+
+    for symbol in symbols:
+        entry = None if use_global else pool.get(symbol)
+        if entry is None:
+            shared.append(symbol)
+            continue
+        df = _model_input(symbol, frames, entry["features"])
+        if df is None:
+            continue
+        X_input = latest_window(df, entry["scaler"], entry["time_steps"] or time_steps, entry["features"])
+        if X_input is None:
+            print(f"⚠️ Not enough data for {symbol}. Skipping...")
+            continue
+        pred_scaled = entry["forward"](X_input)
+        predictions[symbol] = float(inverse_transform_close(entry["scaler"], pred_scaled)[0][0])
+        print(f"📈 Predicted next close for {symbol}: ${predictions[symbol]:.2f}")
+
+    if shared:
+        if pool.get_global() is None:
+            for symbol in shared:
+                print(f"⚠️ Model not found for {symbol}. Skipping...")
+        else:
+            predictions.update(predict_global(shared, frames, pool))
+
+    return {symbol: predictions[symbol] for symbol in symbols if symbol in predictions}
+
+
+def predict_cached(symbols, frames=None, use_global=False, pool=None):
+    """predict_many backed by the prediction cache in the database.
+
+    A symbol whose latest bar was already predicted by its current model is
+    read back; only the others are computed (and then stored).
+    """
+    frames = dict(frames or {})
+    cached, keys, misses = {}, {}, []
+    for symbol in symbols:
+        df = frames.get(symbol)
+        if df is None:
+            df = frames[symbol] = fetch_stock_data(symbol)
+        if df.empty or 'date' not in df.columns:
+            misses.append(symbol)
+            continue
+        keys[symbol] = (df['date'].iloc[-1], model_version(symbol, use_global))
+        price = prediction_cache.lookup(symbol, *keys[symbol])
+        if price is None:
+            misses.append(symbol)
+        else:
+            cached[symbol] = price
+            print(f"💾 Cached next close for {symbol}: ${price:.2f}")
+
+    computed = predict_many(misses, frames, use_global, pool) if misses else {}
+    for symbol, price in computed.items():
+        if symbol in keys:
+            prediction_cache.store(symbol, *keys[symbol], price)
+
+    predictions = {**cached, **computed}
+    return {symbol: predictions[symbol] for symbol in symbols if symbol in predictions}
+
 
-    data = df['close'].values.reshape(-1, 1)
-    if len(data) < time_steps:
-        print(f"⚠️ Not enough data for {symbol}. Skipping...")
+def predict_future(symbol, time_steps=60):
+    """Predict the next close for one symbol (through the warm model pool)."""
+    return predict_many([symbol], time_steps=time_steps).get(symbol)
+
+# ---------- Global multi-symbol model ----------
+def load_global_model():
+    """Return (model, scalers by symbol, metrics) of the global model, or None if not trained."""
+    if not all(os.path.exists(p) for p in (GLOBAL_MODEL_PATH, GLOBAL_SCALERS_PATH, GLOBAL_METRICS_PATH)):
         return None
+    from keras.models import load_model
+    with open(GLOBAL_METRICS_PATH) as f:
+        metrics = json.load(f)
+    return load_model(GLOBAL_MODEL_PATH, compile=False), joblib.load(GLOBAL_SCALERS_PATH), metrics
+
+
+def predict_global(symbols, frames=None, pool=None):
+    """Predict the next close for several symbols in one batched forward pass.
+
+    Uses the global model from `pool`; `frames` optionally maps symbol →
+    price frame. Symbols the model wasn't trained on, or without enough
+    data, are left out of the result.
+    """
+    entry = (pool or model_pool).get_global()
+    if entry is None:
+        print("⚠️ Global model not found. Train it with: python train.py --global")
+        return {}
+    ids, scalers, features = entry["ids"], entry["scalers"], entry["features"]
+    frames = frames or {}
+
+    served, windows = [], []
+    for symbol in symbols:
+        if symbol not in ids:
+            print(f"⚠️ {symbol} is not part of the global model. Skipping...")
+            continue
+        df = _model_input(symbol, frames, features)
+        if df is None:
+            continue
+        X_input = latest_window(df, scalers[symbol], entry["time_steps"], features)
+        if X_input is None:
+            print(f"⚠️ Not enough data for {symbol}. Skipping...")
+            continue
+        served.append(symbol)
+        windows.append(X_input[0])
+
+    if not served:
+        return {}
 
-    scaled = scaler.transform(data)
-    last_seq = scaled[-time_steps:]
-    X_input = np.reshape(last_seq, (1, time_steps, 1))
-    pred_scaled = model.predict(X_input)
-    pred_price = scaler.inverse_transform(pred_scaled)
-    predicted_value = float(pred_price[0][0])
+    symbol_ids = np.array([[ids[s]] for s in served], dtype=np.int32)
+    pred_scaled = entry["forward"]([np.stack(windows).astype(np.float32), symbol_ids])
 
-    print(f"📈 Predicted next close for {symbol}: ${predicted_value:.2f}")
-    return predicted_value
+    predictions = {}
+    for symbol, value in zip(served, pred_scaled[:, 0]):
+        predictions[symbol] = float(inverse_transform_close(scalers[symbol], value)[0][0])
+        print(f"📈 Predicted next close for {symbol}: ${predictions[symbol]:.2f}")
+    return predictions
 
 # ---------- Main multi-stock prediction ----------
 if __name__ == "__main__":
     # Define all your tracked stocks here
     symbols = ["AAPL", "MSFT", "GOOGL", "TSLA", "AMZN", "INFY", "META", "NFLX"]
 
-    results = []
-    for sym in symbols:
-        pred = predict_future(sym)
-        if pred is not None:
-            results.append({"symbol": sym, "predicted_price": pred})
+    # Ask the running prediction service first (python prediction_service.py);
+    # --local, --global or --runtime always predict in this process
+    predictions = None
+    if not any(flag in sys.argv for flag in ("--local", "--global", "--runtime")):
+        from prediction_service import request_predictions
+        predictions = request_predictions(symbols)
+        if predictions is not None:
+            print(f"🛰️ Served by the prediction service: {len(predictions)}/{len(symbols)} symbols")
 
-    if results:
-        df_results = pd.DataFrame(results)
+    if predictions is None:
+        frames = fetch_stock_data_many(symbols)
+
+        # --runtime keras|tflite: serve the Keras models or the TFLite exports
+        # instead of the NumPy kernel
+        if "--runtime" in sys.argv:
+            model_pool = ModelPool(runtime=sys.argv[sys.argv.index("--runtime") + 1])
+
+        model_registry.note_use(symbols)
+
+        # --global: one model, one forward pass for the whole list.
+        # Bars already predicted by the same model come from the database.
+        predictions = predict_cached(symbols, frames=frames, use_global="--global" in sys.argv, pool=model_pool)
+
+    if predictions:
+        df_results = pd.DataFrame({"symbol": list(predictions), "predicted_price": list(predictions.values())})
         output_path = "predictions.csv"
         df_results["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         df_results.to_csv(output_path, index=False)
         print(f"\n✅ Predictions saved to {output_path}")
     else:
-
-        print("\n⚠️ No predictions were generated. Please ensure models exist for each symbol.")
-
         print("\n⚠️ No predictions were generated. Please ensure models exist for each symbol.")
@@ -0,0 +1,106 @@
+# prediction_cache.py
+
+import pandas as pd
+from datetime import datetime
+from db import get_connection, init_db
+from candle_store import bar_is_final
+
+# Next-close predictions only change when a new daily bar arrives or the
+# model is replaced, so they are stored in the `predictions` table keyed on
+# (symbol, as_of bar date, model version) and reused until then. Rows of
+# replaced models stay in the table (marked stale) as the history that
+# monitor.evaluate_model scores. Only bars whose session has closed are
+# cached: the close of an unfinished bar still changes under the same date.
+
+_initialized = False
+
+
+def _ensure_tables():
+    global _initialized
+    if not _initialized:
+        init_db()
+        _initialized = True
+
+
+def _day(as_of):
+    return pd.Timestamp(as_of).strftime("%Y-%m-%d")
+
+
+# ===========================================
+#  READ
+# ===========================================
+def lookup(symbol, as_of, model_version):
+    """Cached prediction made from the bar of `as_of` by `model_version`, or None."""
+    if model_version is None or not bar_is_final(symbol, as_of):
+        return None
+    _ensure_tables()
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT predicted_price FROM predictions "
+        "WHERE symbol = ? AND as_of = ? AND model_version = ? AND stale = 0",
+        (symbol, _day(as_of), model_version),
+    ).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def history(symbol):
+    """Every prediction made for `symbol`, one per bar (the newest model's), oldest first."""
+    _ensure_tables()
+    conn = get_connection()
+    df = pd.read_sql_query(
+        """
+        SELECT as_of, predicted_price, model_version, created_at FROM predictions
+        WHERE symbol = ? AND as_of IS NOT NULL
+        ORDER BY as_of, id
+        """,
+        conn, params=(symbol,),
+    )
+    conn.close()
+    df['as_of'] = pd.to_datetime(df['as_of'])
+    return df.drop_duplicates('as_of', keep='last').reset_index(drop=True)
+
+
+# ===========================================
+#  WRITE
+# ===========================================
+def store(symbol, as_of, model_version, predicted_price):
+    """Save a prediction (replacing any earlier one for the same key).
+
+    Predictions from a bar that isn't final yet are not saved.
+    """
+    if model_version is None or not bar_is_final(symbol, as_of):
+        return
+    _ensure_tables()
+    day = _day(as_of)
+    conn = get_connection()
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO predictions
+            (company, date, predicted_price, created_at, symbol, as_of, model_version, stale)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+        """,
+        (symbol, day, float(predicted_price), datetime.now().isoformat(), symbol, day, model_version),
+    )
+    conn.commit()
+    conn.close()
+
+
+def invalidate(symbol=None, global_model=False):
+    """Mark cached predictions stale after a model is rewritten.
+
+    Drops the ones of `symbol`'s own model, or with `global_model` every
+    one served by the global model. Returns the number of rows affected.
+    """
+    _ensure_tables()
+    query, params = "UPDATE predictions SET stale = 1 WHERE stale = 0 AND model_version IS NOT NULL", []
+    if global_model:
+        query += " AND model_version LIKE 'global-%'"
+    if symbol is not None:
+        query += " AND symbol = ?"
+        params.append(symbol)
+    conn = get_connection()
+    count = conn.execute(query, params).rowcount
+    conn.commit()
+    conn.close()
+    return count
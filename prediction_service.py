@@ -0,0 +1,289 @@
+# prediction_service.py
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from model_registry import note_use, most_used
+
+# Where clients look for the service (python prediction_service.py --port ...)
+SERVICE_URL = os.getenv("PREDICTION_SERVICE_URL", "http://127.0.0.1:8765")
+
+# Requests arriving within this window of the first one share a batch
+BATCH_WINDOW_MS = 5
+MAX_BATCH = 64
+
+# Clients give up and predict in-process after this long
+CLIENT_TIMEOUT = 10.0
+
+# Request latencies kept for the percentiles in /stats
+LATENCY_SAMPLES = 10000
+
+# Pending connections the socket accepts (the socketserver default of 5
+# makes bursts of sessions wait out TCP retransmits)
+LISTEN_BACKLOG = 256
+
+
+class ServiceStats:
+    """Request, batch and latency counters of the running service."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.symbols_predicted = 0
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record_batch(self, n_requests, n_symbols):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += n_requests
+            self.symbols_predicted += n_symbols
+
+    def record_request(self, latency_ms, ok):
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self.latencies_ms.append(latency_ms)
+
+    def as_dict(self):
+        with self._lock:
+            latencies = np.array(self.latencies_ms)
+            stats = {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_requests": round(self.batched_requests / self.batches, 2) if self.batches else None,
+                "symbols_predicted": self.symbols_predicted,
+            }
+        for p in (50, 90, 99):
+            stats[f"p{p}_ms"] = round(float(np.percentile(latencies, p)), 3) if len(latencies) else None
+        return stats
+
+
+class MicroBatcher:
+    """Merges concurrent prediction requests into one `predict_fn(symbols, frames)` call.
+
+    A request waits at most `window_ms` for others to join its batch (up to
+    `max_batch` requests). The batch predicts every distinct symbol once and
+    each request gets back the symbols it asked for. Requests bring their
+    candle frames along, so the batch thread never waits on a provider.
+    """
+
+    def __init__(self, predict_fn, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, stats=None):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = stats or ServiceStats()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def submit(self, symbols, frames=None, timeout=CLIENT_TIMEOUT):
+        """Block until `symbols` are predicted from `frames` ({symbol: candles}); returns {symbol: price}."""
+        request = {"symbols": symbols, "frames": frames or {}, "done": threading.Event(),
+                   "result": None, "error": None, "started": time.perf_counter()}
+        self._queue.put(request)
+        if not request["done"].wait(timeout):
+            raise TimeoutError(f"prediction of {symbols} took over {timeout}s")
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            symbols = list(dict.fromkeys(s for request in batch for s in request["symbols"]))
+            frames = {}
+            for request in batch:
+                frames.update(request["frames"])
+            try:
+                predictions, error = self.predict_fn(symbols, frames), None
+            except Exception as e:
+                predictions, error = {}, e
+            self.stats.record_batch(len(batch), len(symbols))
+
+            for request in batch:
+                request["error"] = error
+                request["result"] = {s: predictions[s] for s in request["symbols"] if s in predictions}
+                self.stats.record_request((time.perf_counter() - request["started"]) * 1000, error is None)
+                request["done"].set()
+
+
+# ===========================================
+#  HTTP SERVER
+# ===========================================
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+
+def _handler(batcher, pool=None, fetch_frames=None):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            if url.path == "/health":
+                self._reply(200, {"status": "ok"})
+            elif url.path == "/stats":
+                stats = batcher.stats.as_dict()
+                if pool is not None:
+                    stats["model_cache"] = pool.cache.stats()
+                self._reply(200, stats)
+            elif url.path == "/predict":
+                query = urllib.parse.parse_qs(url.query)
+                symbols = [s.strip().upper() for s in ",".join(query.get("symbols", [])).split(",") if s.strip()]
+                if not symbols:
+                    self._reply(400, {"error": "pass ?symbols=AAPL,MSFT"})
+                    return
+                note_use(symbols)
+                try:
+                    # Fetched on this request's own thread, outside the batch
+                    frames = fetch_frames(symbols) if fetch_frames is not None else None
+                    self._reply(200, {"predictions": batcher.submit(symbols, frames)})
+                except Exception as e:
+                    self._reply(500, {"error": str(e)})
+            elif url.path == "/forecast":
+                # Multi-day rollouts are batched over their Monte-Carlo paths
+                # already, so they skip the micro-batcher
+                from forecast import forecast
+                query = urllib.parse.parse_qs(url.query)
+                try:
+                    symbol = query["symbol"][0].upper()
+                    note_use([symbol])
+                    result = forecast(symbol, int(query.get("horizon", [10])[0]))
+                except (KeyError, ValueError) as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+                records = None if result is None else json.loads(result.to_json(orient="records", date_format="iso"))
+                self._reply(200, {"forecast": records})
+            else:
+                self._reply(404, {"error": f"unknown path {url.path}"})
+
+        def log_message(self, format, *args):
+            pass  # one line per request would drown the batch logs
+
+    return PredictionHandler
+
+
+def fetch_frames(symbols):
+    """Candle frames of `symbols` for a /predict request (one batched provider fetch)."""
+    from finnhub_client import fetch_stock_data_many
+
+    return fetch_stock_data_many(symbols)
+
+
+def serving_predict_fn(pool=None):
+    """Batch prediction over the warm model pool from the frames the requests brought.
+
+    Bars already predicted by the same model are read from the prediction cache.
+    """
+    from predict import predict_cached, model_pool
+
+    pool = pool or model_pool
+
+    def predict(symbols, frames):
+        return predict_cached(symbols, frames=frames, pool=pool)
+    return predict
+
+
+def serve(host="127.0.0.1", port=8765, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, preload=None):
+    """Run the prediction service until interrupted.
+
+    `preload` most-requested symbols (default predict.PRELOAD_MODELS) are
+    loaded before the first request.
+    """
+    from predict import model_pool, PRELOAD_MODELS
+
+    model_pool.preload(most_used(PRELOAD_MODELS if preload is None else preload))
+    batcher = MicroBatcher(serving_predict_fn(model_pool), window_ms, max_batch)
+    server = PredictionServer((host, port), _handler(batcher, model_pool, fetch_frames))
+    print(f"🛰️ Prediction service on http://{host}:{port} (batch window {window_ms}ms, max {max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Prediction service stopped.")
+    finally:
+        server.server_close()
+
+
+# ===========================================
+#  CLIENT
+# ===========================================
+def request_predictions(symbols, url=None, timeout=CLIENT_TIMEOUT):
+    """{symbol: price} from the running service, or None if it can't be reached."""
+    query = urllib.parse.urlencode({"symbols": ",".join(symbols)})
+    try:
+        with urllib.request.urlopen(f"{url or SERVICE_URL}/predict?{query}", timeout=timeout) as response:
+            return json.load(response)["predictions"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+
+
+def request_forecast(symbol, horizon=10, url=None, timeout=CLIENT_TIMEOUT):
+    """Forecast frame from the running service (see forecast.forecast), or None if it
+    can't be reached. An empty frame means the service has no forecast for `symbol`.
+    """
+    import pandas as pd
+
+    query = urllib.parse.urlencode({"symbol": symbol, "horizon": horizon})
+    try:
+        with urllib.request.urlopen(f"{url or SERVICE_URL}/forecast?{query}", timeout=timeout) as response:
+            records = json.load(response)["forecast"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+    result = pd.DataFrame(records or [], columns=["date", "mean", "lower", "upper"])
+    result["date"] = pd.to_datetime(result["date"])
+    return result
+
+
+def service_stats(url=None, timeout=2.0):
+    """The service's /stats, or None if it isn't running."""
+    try:
+        with urllib.request.urlopen(f"{url or SERVICE_URL}/stats", timeout=timeout) as response:
+            return json.load(response)
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local micro-batching prediction service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(urllib.parse.urlparse(SERVICE_URL).port or 8765))
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS,
+                        help="How long a request waits for others to share its batch")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Most requests merged into one batch")
+    parser.add_argument("--preload", type=int, default=None,
+                        help="Load this many of the most-requested symbols' models at startup")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.window_ms, args.max_batch, args.preload)
@@ -1,49 +1,67 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler
 from finnhub_client import fetch_stock_data  # Make sure this function accepts a 'symbol' argument
 
-def prepare_lstm_data(df, time_steps=60):
-    """Convert raw stock data into time-series sequences for LSTM"""
-    if 'close' not in df.columns:
-        raise ValueError("DataFrame must contain a 'close' column")
+def feature_list(feature_columns=None):
+    """Normalize a feature column list so that the target, 'close', comes first."""
+    if not feature_columns:
+        return ['close']
+    return ['close'] + [c for c in feature_columns if c != 'close']
 
-    data = df['close'].values.reshape(-1, 1)
-    print(f"Data length before scaling: {len(data)}")
-    if len(data) < time_steps:
-        raise ValueError("Not enough data ({len(data)}) to create sequences with {time_steps} time_steps.")
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(data)
 
-    X, y = [], []
-    for i in range(time_steps, len(scaled_data)):
-        X.append(scaled_data[i-time_steps:i, 0])
-        y.append(scaled_data[i, 0])
+def _feature_matrix(df, columns):
+    """(N, F) float32 matrix of `columns` without NaN rows.
+
+    For a canonical close-only frame this is a view of the float32 close
+    column, no copy is made until scaling.
+    """
+    if columns == ['close']:
+        data = df['close'].to_numpy(dtype=np.float32).reshape(-1, 1)
+        return data[~np.isnan(data[:, 0])] if np.isnan(data).any() else data
+    return df[columns].dropna().to_numpy(dtype=np.float32)
 
-    X, y = np.array(X), np.array(y)
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
-    return X, y, scaler
 
-def prepare_lstm_data(df, time_steps=60, return_test=False):
-    """Convert raw stock data into time-series sequences for LSTM, with optional train/test split."""
-    if 'close' not in df.columns:
-        raise ValueError("DataFrame must contain a 'close' column")
+def scale_features(df, time_steps=60, feature_columns=None):
+    """Fit a MinMaxScaler on the feature columns and return (scaled float32 matrix, scaler).
 
-    data = df['close'].values.reshape(-1, 1)
+    The matrix is (N, F) with 'close' in column 0; leading rows where an
+    indicator is still warming up (NaN) are dropped.
+    """
+    columns = feature_list(feature_columns)
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"DataFrame must contain a {', '.join(repr(c) for c in missing)} column")
+
+    data = _feature_matrix(df, columns)
     print(f"Data length before scaling: {len(data)}")
-    if len(data) < time_steps:
+    if len(data) <= time_steps:
         raise ValueError(f"Not enough data ({len(data)}) to create sequences with {time_steps} time_steps.")
 
     scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(data)
+    return scaler.fit_transform(data), scaler
+
+
+def inverse_transform_close(scaler, values):
+    """Map scaled close values back to prices, for single- or multi-feature scalers."""
+    values = np.asarray(values, dtype=np.float64).reshape(-1, 1)
+    return (values - scaler.min_[0]) / scaler.scale_[0]
 
-    X, y = [], []
-    for i in range(time_steps, len(scaled_data)):
-        X.append(scaled_data[i-time_steps:i, 0])
-        y.append(scaled_data[i, 0])
 
-    X, y = np.array(X), np.array(y)
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+def prepare_lstm_data(df, time_steps=60, return_test=False, feature_columns=None):
+    """Convert raw stock data into time-series sequences for LSTM, with optional train/test split.
+
+    Windows are strided float32 views over the scaled data: X[i] is
+    rows i..i + time_steps - 1 and y[i] is the scaled close right after them.
+    No window is copied, so X is read-only and costs no more memory than the
+    series itself. `feature_columns` (e.g. from the feature store) selects
+    extra input columns; by default the model only sees 'close'.
+    """
+    matrix, scaler = scale_features(df, time_steps, feature_columns)
+
+    X = sliding_window_view(matrix[:-1], time_steps, axis=0).transpose(0, 2, 1)
+    y = matrix[time_steps:, 0]
 
     if return_test:
         split = int(len(X) * 0.8)
@@ -54,8 +72,120 @@ def prepare_lstm_data(df, time_steps=60, return_test=False):
     return X, y, scaler
 
 
-def get_prepared_data(symbol, time_steps=20):
-    """Fetch and prepare data for a given stock symbol"""
+def transform_windows(df, scaler, time_steps=60, feature_columns=None):
+    """Windows of `df` scaled with an already fitted `scaler` (e.g. for fine-tuning).
+
+    Returns (X, y, target_dates) where target_dates[i] is the date of the
+    bar y[i] predicts, so callers can select windows by date.
+    """
+    columns = feature_list(feature_columns)
+    frame = df[['date'] + columns].dropna()
+    if len(frame) <= time_steps:
+        raise ValueError(f"Not enough data ({len(frame)}) to create sequences with {time_steps} time_steps.")
+    matrix = scaler.transform(frame[columns].to_numpy(dtype=np.float32)).astype(np.float32)
+
+    X = sliding_window_view(matrix[:-1], time_steps, axis=0).transpose(0, 2, 1)
+    y = matrix[time_steps:, 0]
+    return X, y, frame['date'].to_numpy()[time_steps:]
+
+
+def latest_window(df, scaler, time_steps=60, feature_columns=None):
+    """Scale the last `time_steps` rows of `df` into a (1, time_steps, F) model input."""
+    columns = feature_list(feature_columns)
+    # Only the tail is needed; a few spare rows in case it holds NaNs
+    data = _feature_matrix(df.iloc[-(time_steps + 50):], columns)
+    if len(data) < time_steps:
+        data = _feature_matrix(df, columns)
+    if len(data) < time_steps:
+        return None
+    return scaler.transform(data[-time_steps:])[np.newaxis]
+
+
+def make_window_dataset(series_list, time_steps=60, batch_size=32, shuffle_buffer=None,
+                        ranges=None, seed=None):
+    """tf.data pipeline that cuts (window, next value) pairs out of raw series on the fly.
+
+    `series_list` holds one or more scaled float32 series (e.g. one per
+    symbol), each 1-D or (N, F) with the target in column 0; windows never
+    cross from one series into the next. `ranges`
+    optionally restricts each series to window indices [start, end), using
+    the same numbering as `prepare_lstm_data`. Only the raw series and an
+    int64 index per sample live in memory; each batch of windows is gathered
+    when it is needed and prefetched while the model trains on the previous one.
+    """
+    import tensorflow as tf
+
+    if isinstance(series_list, np.ndarray):
+        series_list = [series_list]
+    series_list = [s.reshape(len(s), -1) for s in series_list]
+    ranges = ranges or [(0, None)] * len(series_list)
+
+    offsets, starts = 0, []
+    for series, (start, end) in zip(series_list, ranges):
+        n_windows = len(series) - time_steps
+        end = n_windows if end is None else min(end, n_windows)
+        if end > start:
+            starts.append(np.arange(start, end, dtype=np.int64) + offsets)
+        offsets += len(series)
+
+    flat = tf.constant(np.concatenate(series_list).astype(np.float32, copy=False))
+    starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+    offsets_in_window = tf.range(time_steps, dtype=tf.int64)
+
+    def _gather(idx):
+        X = tf.gather(flat, idx[:, tf.newaxis] + offsets_in_window)
+        y = tf.gather(flat[:, 0], idx + time_steps)
+        return X, y
+
+    ds = tf.data.Dataset.from_tensor_slices(starts)
+    if shuffle_buffer:
+        ds = ds.shuffle(min(shuffle_buffer, max(len(starts), 1)), seed=seed, reshuffle_each_iteration=True)
+    return (ds.batch(batch_size)
+              .map(_gather, num_parallel_calls=tf.data.AUTOTUNE)
+              .prefetch(tf.data.AUTOTUNE))
+
+
+def array_dataset(X, y, batch_size=32, shuffle=True, seed=None):
+    """Shuffled, batched and prefetched tf.data pipeline over in-memory windows."""
+    import tensorflow as tf
+
+    ds = tf.data.Dataset.from_tensor_slices((np.ascontiguousarray(X), np.asarray(y, dtype=np.float32)))
+    if shuffle:
+        ds = ds.shuffle(len(X), seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def prepare_lstm_dataset(df, time_steps=60, batch_size=32, shuffle_buffer=10000,
+                         return_test=False, seed=None, feature_columns=None):
+    """Streaming counterpart of `prepare_lstm_data`.
+
+    Scales the data the same way and returns a shuffled, batched,
+    prefetched `tf.data.Dataset` instead of materialized X/y arrays. With
+    `return_test`, also returns an ordered test dataset over the last 20% of
+    windows plus its (small) y_test array for evaluation.
+    """
+    series, scaler = scale_features(df, time_steps, feature_columns)
+    n_windows = len(series) - time_steps
+
+    if not return_test:
+        return make_window_dataset(series, time_steps, batch_size, shuffle_buffer, seed=seed), scaler
+
+    split = int(n_windows * 0.8)
+    train_ds = make_window_dataset(series, time_steps, batch_size, shuffle_buffer,
+                                   ranges=[(0, split)], seed=seed)
+    test_ds = make_window_dataset(series, time_steps, batch_size, ranges=[(split, None)])
+    y_test = series[time_steps + split:, 0]
+    return train_ds, scaler, test_ds, y_test
+
+
+def get_prepared_data(symbol, time_steps=20, feature_columns=None):
+    """Fetch and prepare data for a given stock symbol.
+
+    With `feature_columns`, the data comes from the cached feature store.
+    """
     df = fetch_stock_data(symbol)
-    X, y, scaler = prepare_lstm_data(df, time_steps)
+    if feature_columns:
+        from feature_store import get_features
+        df = get_features(symbol, df)
+    X, y, scaler = prepare_lstm_data(df, time_steps, feature_columns=feature_columns)
     return X, y, scaler, df
@@ -0,0 +1,230 @@
+# provider_health.py
+
+import time
+import threading
+from datetime import datetime
+from db import get_connection, init_db
+from provider_replay import is_live
+
+# Consecutive failures before a breaker opens
+SYMBOL_FAILURE_THRESHOLD = 3
+ENDPOINT_FAILURE_THRESHOLD = 5
+
+# How long an open breaker routes around the provider before probing again;
+# doubles after every failed probe up to the max
+BASE_COOLDOWN = 15 * 60
+MAX_COOLDOWN = 12 * 60 * 60
+
+# Weight of the newest sample in the moving average latency
+LATENCY_ALPHA = 0.2
+
+ALL_SYMBOLS = "*"
+
+
+class CircuitBreaker:
+    """Success/latency stats and open/half-open/closed state for one provider route."""
+
+    def __init__(self, provider, endpoint, symbol, threshold):
+        self.provider = provider
+        self.endpoint = endpoint
+        self.symbol = symbol
+        self.threshold = threshold
+        self.state = "closed"
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.avg_latency_ms = None
+        self.cooldown = BASE_COOLDOWN
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.last_error = None
+
+    def allow(self, now):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and now >= self.open_until:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record(self, ok, latency_ms, error, now):
+        if latency_ms is not None:
+            if self.avg_latency_ms is None:
+                self.avg_latency_ms = latency_ms
+            else:
+                self.avg_latency_ms += LATENCY_ALPHA * (latency_ms - self.avg_latency_ms)
+
+        was_probe = self.state == "half_open"
+        self.probe_in_flight = False
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = "closed"
+            self.cooldown = BASE_COOLDOWN
+            return
+
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if was_probe:
+            self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN)
+        if was_probe or self.consecutive_failures >= self.threshold:
+            self.state = "open"
+            self.open_until = now + self.cooldown
+
+    def as_dict(self):
+        total = self.successes + self.failures
+        return {
+            "provider": self.provider,
+            "endpoint": self.endpoint,
+            "symbol": self.symbol,
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": self.successes / total if total else None,
+            "consecutive_failures": self.consecutive_failures,
+            "avg_latency_ms": self.avg_latency_ms,
+            "cooldown_s": self.cooldown,
+            "open_until": datetime.fromtimestamp(self.open_until).isoformat() if self.state != "closed" else None,
+            "last_error": self.last_error,
+        }
+
+
+class ProviderHealth:
+    """Per (provider, endpoint, symbol) circuit breakers, persisted to SQLite.
+
+    Every route also feeds an endpoint-wide breaker (symbol "*") so a provider
+    that is down for everyone is skipped without burning one failure per symbol.
+    State survives restarts, which matters for the short-lived nightly jobs.
+    """
+
+    def __init__(self, persist=True):
+        self.persist = persist
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded or not self.persist:
+            self._loaded = True
+            return
+        self._loaded = True
+        try:
+            init_db()
+            conn = get_connection()
+            rows = conn.execute("""
+                SELECT provider, endpoint, symbol, state, successes, failures,
+                       consecutive_failures, avg_latency_ms, cooldown, open_until, last_error
+                FROM provider_health
+            """).fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ Could not load provider health: {e}")
+            return
+
+        for (provider, endpoint, symbol, state, successes, failures,
+             consecutive, latency, cooldown, open_until, last_error) in rows:
+            breaker = self._get(provider, endpoint, symbol)
+            # A probe can't still be in flight after a restart
+            breaker.state = "open" if state == "half_open" else state
+            breaker.successes = successes
+            breaker.failures = failures
+            breaker.consecutive_failures = consecutive
+            breaker.avg_latency_ms = latency
+            breaker.cooldown = cooldown
+            breaker.open_until = open_until
+            breaker.last_error = last_error
+
+    def _get(self, provider, endpoint, symbol):
+        key = (provider, endpoint, symbol)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            threshold = ENDPOINT_FAILURE_THRESHOLD if symbol == ALL_SYMBOLS else SYMBOL_FAILURE_THRESHOLD
+            breaker = self._breakers[key] = CircuitBreaker(provider, endpoint, symbol, threshold)
+        return breaker
+
+    def _save(self, breakers):
+        if not self.persist:
+            return
+        try:
+            conn = get_connection()
+            conn.executemany("""
+                INSERT OR REPLACE INTO provider_health
+                    (provider, endpoint, symbol, state, successes, failures, consecutive_failures,
+                     avg_latency_ms, cooldown, open_until, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (b.provider, b.endpoint, b.symbol, b.state, b.successes, b.failures,
+                 b.consecutive_failures, b.avg_latency_ms, b.cooldown, b.open_until,
+                 b.last_error, datetime.now().isoformat())
+                for b in breakers
+            ])
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ Could not save provider health: {e}")
+
+    def allow(self, provider, endpoint, symbol):
+        """Should we call `provider` for `symbol` right now? May admit a recovery probe."""
+        now = time.time()
+        with self._lock:
+            self._load()
+            endpoint_breaker = self._get(provider, endpoint, ALL_SYMBOLS)
+            symbol_breaker = self._get(provider, endpoint, symbol)
+            if endpoint_breaker.state != "closed":
+                return endpoint_breaker.allow(now)
+            return symbol_breaker.allow(now)
+
+    def record(self, provider, endpoint, symbol, ok, latency_ms=None, error=None, no_data=False):
+        """Record the outcome of one call.
+
+        `no_data` marks a failure where the provider answered but has nothing
+        for `symbol` (unknown or delisted ticker): it counts against the
+        symbol's breaker only, the endpoint-wide one sees a working provider.
+        """
+        now = time.time()
+        with self._lock:
+            self._load()
+            symbol_breaker = self._get(provider, endpoint, symbol)
+            endpoint_breaker = self._get(provider, endpoint, ALL_SYMBOLS)
+            symbol_breaker.record(ok, latency_ms, error, now)
+            endpoint_breaker.record(ok or no_data, latency_ms, None if no_data else error, now)
+            self._save([symbol_breaker, endpoint_breaker])
+
+    def release(self, provider, endpoint, symbol):
+        """Forget a call that ended without an outcome (cancelled), so its probe slot frees up."""
+        with self._lock:
+            for key in ((provider, endpoint, symbol), (provider, endpoint, ALL_SYMBOLS)):
+                breaker = self._breakers.get(key)
+                if breaker is not None:
+                    breaker.probe_in_flight = False
+
+    def stats(self, provider=None):
+        """Snapshot of every breaker (optionally for one provider), for monitoring."""
+        with self._lock:
+            self._load()
+            return [
+                b.as_dict() for b in self._breakers.values()
+                if provider is None or b.provider == provider
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+            if self.persist:
+                init_db()
+                conn = get_connection()
+                conn.execute("DELETE FROM provider_health")
+                conn.commit()
+                conn.close()
+
+
+# Recorded/replayed runs must not leak breaker state into the live deployment
+provider_health = ProviderHealth(persist=is_live())
+
+
+def get_provider_stats(provider=None):
+    """Provider success rates, latencies and breaker states."""
+    return provider_health.stats(provider)
@@ -0,0 +1,130 @@
+# provider_replay.py
+
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# live   → talk to the providers
+# record → talk to the providers and save every raw response as a fixture
+# replay → never touch the network, serve the saved fixtures
+MODE = os.getenv("STOCKSENSE_PROVIDER_MODE", "live").lower()
+FIXTURE_DIR = os.getenv("STOCKSENSE_FIXTURE_DIR", os.path.join("fixtures", "providers"))
+
+# Extra delay per replayed response: a number of milliseconds, or "recorded"
+# to reproduce the latency measured while recording
+REPLAY_LATENCY_MS = os.getenv("STOCKSENSE_REPLAY_LATENCY_MS", "0")
+
+if MODE not in ("live", "record", "replay"):
+    raise ValueError(f"Unknown STOCKSENSE_PROVIDER_MODE: {MODE!r}")
+
+
+class FixtureMissing(LookupError):
+    """Replay mode was asked for a response that was never recorded."""
+
+
+class ReplayedError(RuntimeError):
+    """A provider failure that was recorded and is now being replayed."""
+
+
+def is_live():
+    return MODE == "live"
+
+
+# ===========================================
+#  FIXTURE FILES
+# ===========================================
+def fixture_path(provider, endpoint, key):
+    """Gzipped JSON file for one (provider, endpoint, request key)."""
+    blob = json.dumps(key, sort_keys=True, default=str)
+    digest = hashlib.sha1(blob.encode()).hexdigest()[:16]
+    return os.path.join(FIXTURE_DIR, provider, f"{endpoint.replace('/', '_')}_{digest}.json.gz")
+
+
+def save_fixture(provider, endpoint, key, payload, latency_ms, error=None):
+    path = fixture_path(provider, endpoint, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fixture = {"key": key, "latency_ms": latency_ms, "payload": payload}
+    if error is not None:
+        fixture["error"] = error
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(fixture, f, default=str)
+
+
+def load_fixture(provider, endpoint, key):
+    path = fixture_path(provider, endpoint, key)
+    if not os.path.exists(path):
+        raise FixtureMissing(f"No {provider} {endpoint} fixture for {key} ({path})")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _replay_delay(fixture):
+    if REPLAY_LATENCY_MS == "recorded":
+        return (fixture.get("latency_ms") or 0) / 1000
+    return float(REPLAY_LATENCY_MS) / 1000
+
+
+# ===========================================
+#  DATAFRAME <-> JSON (yfinance responses)
+# ===========================================
+def encode_frame(df):
+    if df is None:
+        return None
+    return {
+        "columns": [list(c) if isinstance(c, tuple) else c for c in df.columns],
+        "index": [str(i) for i in df.index],
+        "index_name": df.index.name,
+        "data": df.astype(object).where(df.notna(), None).values.tolist(),
+    }
+
+
+def decode_frame(payload):
+    if payload is None:
+        return None
+    columns = payload["columns"]
+    if columns and isinstance(columns[0], list):
+        columns = pd.MultiIndex.from_tuples([tuple(c) for c in columns])
+    index = pd.DatetimeIndex(pd.to_datetime(payload["index"]), name=payload["index_name"])
+    df = pd.DataFrame(payload["data"], index=index, columns=columns)
+    return df.apply(pd.to_numeric, errors="coerce")
+
+
+# ===========================================
+#  RECORD / REPLAY WRAPPER
+# ===========================================
+async def through_fixtures(provider, endpoint, key, fetch, encode=None, decode=None):
+    """Serve one provider call according to MODE.
+
+    `fetch` is a zero-argument coroutine function doing the live call; `key`
+    must identify the request without wall-clock dependent values so that a
+    recording made today is found again tomorrow. Failures are recorded too
+    and replayed as `ReplayedError`.
+    """
+    if MODE == "live":
+        return await fetch()
+
+    if MODE == "replay":
+        fixture = load_fixture(provider, endpoint, key)
+        delay = _replay_delay(fixture)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if "error" in fixture:
+            raise ReplayedError(fixture["error"])
+        return decode(fixture["payload"]) if decode else fixture["payload"]
+
+    started = time.perf_counter()
+    try:
+        result = await fetch()
+    except Exception as e:
+        save_fixture(provider, endpoint, key, None, (time.perf_counter() - started) * 1000, error=str(e))
+        raise
+    latency_ms = (time.perf_counter() - started) * 1000
+    save_fixture(provider, endpoint, key, encode(result) if encode else result, latency_ms)
+    return result
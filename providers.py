@@ -0,0 +1,220 @@
+# providers.py
+
+import os
+import time
+import random
+import asyncio
+import threading
+import requests
+import yfinance as yf
+from dotenv import load_dotenv
+from provider_replay import through_fixtures, encode_frame, decode_frame
+
+load_dotenv()
+
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+
+# Finnhub free tier: 60 calls/minute
+FINNHUB_CALLS_PER_MINUTE = int(os.getenv("FINNHUB_CALLS_PER_MINUTE", "60"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    """Raised when a provider request fails for good (non-retryable or retries exhausted)."""
+
+
+# ===========================================
+#  TOKEN BUCKET RATE LIMITER
+# ===========================================
+class TokenBucket:
+    """Token-bucket limiter shared by every thread and event loop in the process."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)          # tokens per second
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# ===========================================
+#  ASYNC HTTP PROVIDER CLIENT
+# ===========================================
+class ProviderClient:
+    """Rate-limited asyncio HTTP client with timeouts, retries and bounded concurrency.
+
+    Blocking `requests` calls run in worker threads so a slow provider never
+    blocks the event loop. At most `max_concurrency` requests are in flight
+    across the whole process, whichever thread or event loop sends them
+    (`run_sync` starts a fresh loop per call). `base_url` can point at a
+    local fake server.
+    """
+
+    def __init__(self, name, base_url, api_key=None, calls_per_minute=60, burst=None,
+                 max_concurrency=4, timeout=10.0, max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.limiter = TokenBucket(calls_per_minute / 60.0, burst or max(1, calls_per_minute // 6))
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        # "Full jitter" exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _get(self, url, params):
+        # Runs on a worker thread, so waiting for a slot never blocks an event loop
+        with self._slots:
+            return self._session().get(url, params=params, timeout=self.timeout)
+
+    async def get_json(self, path, params=None, fixture_key=None):
+        """GET `path` and return the decoded JSON body.
+
+        In record/replay mode the response is saved to / served from a fixture
+        identified by `fixture_key` (defaults to `params`).
+        """
+        key = fixture_key if fixture_key is not None else params
+        return await through_fixtures(self.name.lower(), path, key,
+                                      lambda: self._get_json_live(path, params))
+
+    async def _get_json_live(self, path, params):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        params = dict(params or {})
+        if self.api_key:
+            params["token"] = self.api_key
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            retry_after = None
+            try:
+                response = await asyncio.to_thread(self._get, url, params)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRYABLE_STATUS:
+                    raise ProviderError(f"{self.name} {path} failed: {error}")
+                header = response.headers.get("Retry-After")
+                if header and header.isdigit():
+                    retry_after = float(header)
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, retry_after)
+                print(f"⏳ {self.name} {path} failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        raise ProviderError(f"{self.name} {path} failed after {self.max_retries + 1} attempts: {error}")
+
+    # ---------- Finnhub endpoints ----------
+    async def stock_candles(self, symbol, resolution, start, end):
+        return await self.get_json("stock/candle", {
+            "symbol": symbol, "resolution": resolution, "from": start, "to": end,
+        }, fixture_key={"symbol": symbol, "resolution": resolution, "days": round((end - start) / 86400)})
+
+    async def general_news(self, category="general", min_id=0):
+        return await self.get_json("news", {"category": category, "minId": min_id})
+
+
+finnhub_provider = ProviderClient(
+    "Finnhub",
+    FINNHUB_BASE_URL,
+    api_key=os.getenv("FINNHUB_API_KEY"),
+    calls_per_minute=FINNHUB_CALLS_PER_MINUTE,
+)
+
+
+# ===========================================
+#  YFINANCE (no HTTP API of its own to call)
+# ===========================================
+async def yfinance_download(tickers, max_retries=2, timeout=30.0, backoff_base=1.0, **kwargs):
+    """Run yf.download in a worker thread with a timeout and jittered retries.
+
+    yfinance swallows most errors and returns an empty frame, so an empty
+    result is retried as well.
+    """
+    key = {"tickers": tickers, **kwargs}
+    return await through_fixtures(
+        "yfinance", "download", key,
+        lambda: _yfinance_download_live(tickers, max_retries, timeout, backoff_base, **kwargs),
+        encode=encode_frame, decode=decode_frame,
+    )
+
+
+async def _yfinance_download_live(tickers, max_retries, timeout, backoff_base, **kwargs):
+    df = None
+    for attempt in range(max_retries + 1):
+        try:
+            df = await asyncio.wait_for(
+                asyncio.to_thread(yf.download, tickers, progress=False, timeout=timeout, **kwargs),
+                timeout=timeout + 5,
+            )
+            if not df.empty:
+                return df
+        except asyncio.TimeoutError:
+            print(f"⏳ yfinance download for {tickers} timed out")
+        if attempt < max_retries:
+            await asyncio.sleep(random.uniform(0, backoff_base * 2 ** attempt))
+    return df
+
+
+# ===========================================
+#  SYNC BRIDGE
+# ===========================================
+def run_sync(coro):
+    """Run `coro` to completion from synchronous code.
+
+    Uses asyncio.run normally; if the calling thread already runs an event
+    loop (e.g. inside a notebook), the coroutine runs on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def _runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=_runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
@@ -1,5 +1,7 @@
 import os
 import json
+from model_registry import resolve
+from model_bundle import load_bundle_metrics
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 
 
@@ -42,7 +44,10 @@ def load_local_llm():
 # Load Metrics
 ###################################################################
 def load_latest_metrics(symbol):
-    path = f"models/{symbol}_metrics.json"
+    metrics = load_bundle_metrics(symbol)
+    if metrics is not None:
+        return metrics
+    path = resolve(symbol, f"models/{symbol}_metrics.json")
     if os.path.exists(path):
         return json.load(open(path))
     return None
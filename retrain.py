@@ -1,61 +1,89 @@
 import os
+import joblib
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from keras.models import load_model
-from finnhub_client import fetch_stock_data
-from prepare_data import prepare_lstm_data
-from train import train_model_for_symbol
-from db import get_connection
+from finnhub_client import fetch_stock_data, fetch_stock_data_many
+from prepare_data import prepare_lstm_data, prepare_lstm_dataset, transform_windows
+from feature_store import get_features
+from predict import load_model_features, load_model_metrics, load_model_backend, load_scaler, load_serving_model
+from train import (train_model_for_symbol, run_for_symbols, optimizer_state_path,
+                   save_optimizer_state, compile_for_finetuning)
+from db import get_connection, init_db
+import backends
+import tflite_export
+import prediction_cache
+import model_registry
 
 # 🔁 List of stocks to retrain weekly (expand as you wish)
 STOCK_LIST = ["AAPL", "MSFT", "GOOGL", "TSLA", "AMZN", "META", "NFLX", "INFY", "TCS"]
 
-def retrain_model(symbol: str):
-    """Retrain or fine-tune the model using latest data for a single stock."""
-    print(f"\n🔄 Starting retraining for {symbol}...")
+# Older windows mixed into an incremental fine-tune so the model doesn't
+# forget them: REPLAY_RATIO × the number of new windows, at least REPLAY_MIN
+REPLAY_RATIO = 1.0
+REPLAY_MIN = 64
 
-    # 1️⃣ Fetch fresh stock data
-    new_data = fetch_stock_data(symbol)
-    if new_data is None or new_data.empty:
-        print(f"⚠️ No data fetched for {symbol}. Skipping retrain.")
-        return
 
-    # 2️⃣ Prepare LSTM data
+def last_cutoff(symbol):
+    """Last bar date the model for `symbol` has been trained on, or None."""
     try:
-        X_train, y_train, scaler = prepare_lstm_data(new_data)
+        init_db()
+        conn = get_connection()
+        row = conn.execute(
+            "SELECT cutoff_date FROM retrain_logs WHERE symbol = ? AND cutoff_date IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (symbol,),
+        ).fetchone()
+        conn.close()
+        if row:
+            return pd.Timestamp(row[0])
     except Exception as e:
-        print(f"❌ Error preparing data for {symbol}: {e}")
-        return
+        print(f"⚠️ Could not read retrain cutoff for {symbol}: {e}")
 
-    # 3️⃣ Ensure model directory exists
-    os.makedirs("models", exist_ok=True)
-    model_path = os.path.join("models", f"{symbol}_lstm_model.h5")
+    # Never retrained: fall back to the cutoff recorded by train.py
+    cutoff = load_model_metrics(symbol).get("cutoff_date")
+    return pd.Timestamp(cutoff) if cutoff else None
 
-    # 4️⃣ Load model or train a new one
-    if os.path.exists(model_path):
-        print(f"📦 Found existing model for {symbol}. Fine-tuning...")
-        model = load_model(model_path)
-    else:
-        print(f"🆕 No model found for {symbol}. Training from scratch...")
-        model = train_model_for_symbol(symbol)
 
-    # 5️⃣ Continue training with new data (fine-tuning)
-    model.fit(X_train, y_train, epochs=5, batch_size=32, verbose=1)
-    model.save(model_path)
-    print(f"✅ Retraining completed for {symbol} → saved at {model_path}")
+def incremental_windows(symbol, data, scaler, features, cutoff, time_steps=60, seed=None):
+    """Windows whose target bar is after `cutoff`, plus a replay sample of older ones.
 
-    # 6️⃣ Log retraining info into the database
+    Returns (X, y, new window count, last target date); X is None when there
+    is nothing new.
+    """
+    X, y, target_dates = transform_windows(data, scaler, time_steps, features)
+    is_new = target_dates > np.datetime64(cutoff) if cutoff is not None else np.ones(len(y), dtype=bool)
+    new_idx = np.flatnonzero(is_new)
+    if len(new_idx) == 0:
+        return None, None, 0, cutoff
+
+    old_idx = np.flatnonzero(~is_new)
+    n_replay = min(len(old_idx), max(REPLAY_MIN, int(len(new_idx) * REPLAY_RATIO)))
+    replay_idx = np.random.default_rng(seed).choice(old_idx, n_replay, replace=False)
+    idx = np.sort(np.concatenate([replay_idx, new_idx]))
+    print(f"🧩 {symbol}: {len(new_idx)} new windows since {cutoff.date() if cutoff is not None else 'the start'}"
+          f" + {n_replay} replayed")
+    return X[idx], y[idx], len(new_idx), pd.Timestamp(target_dates[-1])
+
+
+def log_retrain(symbol, cutoff, notes):
+    """Record a retrain (the model version it published and the last bar it
+    trained on) in retrain_logs."""
     try:
+        init_db()
         conn = get_connection()
         conn.execute(
             """
-            INSERT INTO retrain_logs (retrain_time, model_version, notes)
-            VALUES (?, ?, ?)
+            INSERT INTO retrain_logs (retrain_time, model_version, notes, symbol, cutoff_date)
+            VALUES (?, ?, ?, ?, ?)
             """,
             (
                 datetime.now().isoformat(),
-                f"{symbol}_v{datetime.now().strftime('%Y%m%d')}",
-                f"Weekly retrain completed for {symbol}",
+                model_registry.current_version(symbol) or f"{symbol}_v{datetime.now().strftime('%Y%m%d')}",
+                notes,
+                symbol,
+                pd.Timestamp(cutoff).strftime("%Y-%m-%d") if cutoff is not None else None,
             ),
         )
         conn.commit()
@@ -65,16 +93,143 @@ def retrain_model(symbol: str):
         print(f"⚠️ Failed to log retrain in database for {symbol}: {e}")
 
 
-def retrain_all():
-    """Retrain models for all configured stock symbols."""
-    print("\n🚀 Starting retraining for all configured stocks...\n")
-    for symbol in STOCK_LIST:
+def retrain_model(symbol: str, streaming: bool = False, incremental: bool = False,
+                  export_tflite: bool = False, quantize: str = None):
+    """Retrain or fine-tune the model using latest data for a single stock.
+
+    With `streaming`, windows are built on the fly by a tf.data pipeline.
+    With `incremental`, the model only trains on windows newer than its last
+    training cutoff (plus a replay sample of older windows), scaled with the
+    scaler it was trained with. Model, scaler and optimizer state are saved
+    together so the next fine-tune resumes where this one stopped.
+    With `export_tflite`, the retrained model is converted to TFLite again
+    (see tflite_export.export_tflite).
+    """
+    print(f"\n🔄 Starting retraining for {symbol}...")
+
+    # 1️⃣ Fetch fresh stock data
+    new_data = fetch_stock_data(symbol)
+    if new_data is None or new_data.empty:
+        print(f"⚠️ No data fetched for {symbol}. Skipping retrain.")
+        return
+
+    # 2️⃣ Ensure model directory exists
+    os.makedirs("models", exist_ok=True)
+    backend = load_model_backend(symbol)
+    model_path = backends.model_path(symbol, backend)
+    scaler_path = os.path.join("models", f"{symbol}_scaler.pkl")
+    optimizer_path = optimizer_state_path(symbol)
+
+    # 3️⃣ No model yet → train one from scratch (that is the whole retrain)
+    if not os.path.exists(model_path):
+        print(f"🆕 No model found for {symbol}. Training from scratch...")
+        model = train_model_for_symbol(symbol, streaming=streaming, export_tflite=export_tflite,
+                                       quantize=quantize)
+        if model is not None:
+            log_retrain(symbol, new_data['date'].iloc[-1], f"Initial training for {symbol}")
+        return model
+
+    # Closed-form backends have nothing to fine-tune: refit them (takes seconds)
+    if not backends.is_keras_backend(backend):
+        model = train_model_for_symbol(symbol, feature_columns=load_model_features(symbol),
+                                       hyperparams=load_model_metrics(symbol).get("hyperparams"),
+                                       backend=backend, export_tflite=export_tflite, quantize=quantize)
+        if model is not None:
+            log_retrain(symbol, new_data['date'].iloc[-1], f"Refit {backend} model for {symbol}")
+        return model
+
+    # 4️⃣ Prepare data (same input columns the model was trained on)
+    features = load_model_features(symbol)
+    time_steps = load_model_metrics(symbol).get("time_steps", 60)
+    if len(features) > 1:
+        new_data = get_features(symbol, new_data)
+    cutoff = new_data['date'].iloc[-1]
+    # The scaler the model was trained with (from its published version);
+    # incremental windows must be scaled with it
+    scaler = None
+    if incremental:
         try:
-            retrain_model(symbol)
-        except Exception as e:
-            print(f"❌ Error retraining {symbol}: {e}")
+            scaler = load_scaler(symbol)
+        except FileNotFoundError:
+            print(f"⚠️ No saved scaler for {symbol}; retraining on the full history instead of incrementally.")
+    n_new = None
+    try:
+        if scaler is not None:
+            X_train, y_train, n_new, cutoff = incremental_windows(
+                symbol, new_data, scaler, features, last_cutoff(symbol), time_steps)
+            if X_train is None:
+                print(f"✅ {symbol} model is already up to date (cutoff {cutoff.date()}).")
+                # Nothing was trained: hand back the published model as serving loads it
+                return load_serving_model(symbol)
+        elif streaming:
+            train_ds, scaler = prepare_lstm_dataset(new_data, time_steps, batch_size=32, feature_columns=features)
+        else:
+            X_train, y_train, scaler = prepare_lstm_data(new_data, time_steps, feature_columns=features)
+    except Exception as e:
+        print(f"❌ Error preparing data for {symbol}: {e}")
+        return
+
+    # 5️⃣ Load the model with its optimizer state and fine-tune
+    print(f"📦 Found existing model for {symbol}. Fine-tuning...")
+    model = compile_for_finetuning(load_model(model_path, compile=False), optimizer_path)
+    if streaming and n_new is None:
+        model.fit(train_ds, epochs=5, verbose=1)
+    else:
+        model.fit(X_train, y_train, epochs=5, batch_size=32, verbose=1)
+
+    backends.save_model(model, symbol, backend)
+    backends.write_atomically(scaler_path, lambda path: joblib.dump(scaler, path))
+    save_optimizer_state(model, optimizer_path)
+    prediction_cache.invalidate(symbol)
+    print(f"✅ Retraining completed for {symbol} → saved at {model_path}")
+
+    if export_tflite:
+        # Validate on the most recent 20% of windows
+        X_all, y_all, _ = transform_windows(new_data, scaler, time_steps, features)
+        recent = int(len(X_all) * 0.8)
+        tflite_export.export_tflite(symbol, model, X_all[recent:], y_all[recent:], scaler, backend, quantize,
+                                    representative=X_all[:recent])
+
+    # Serving processes pick the new version up from the registry
+    model_registry.publish(symbol)
+
+    # 6️⃣ Log retraining info into the database
+    if n_new is not None:
+        notes = f"Incremental retrain for {symbol} ({n_new} new windows)"
+    elif incremental:
+        notes = f"Full retrain for {symbol} (incremental requested, no saved scaler)"
+    else:
+        notes = f"Weekly retrain completed for {symbol}"
+    log_retrain(symbol, cutoff, notes)
+
+    return model
+
+
+def retrain_all(streaming=False, workers=1, incremental=False, export_tflite=False, quantize=None):
+    """Retrain models for all configured stock symbols, `workers` at a time."""
+    print("\n🚀 Starting retraining for all configured stocks...\n")
+    fetch_stock_data_many(STOCK_LIST)
+    results = run_for_symbols(retrain_model, STOCK_LIST, workers=workers,
+                              streaming=streaming, incremental=incremental,
+                              export_tflite=export_tflite, quantize=quantize)
     print("\n✅ All retraining tasks completed!\n")
+    return results
 
 
 if __name__ == "__main__":
-    retrain_all()
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streaming", action="store_true",
+                        help="Build training windows on the fly (tf.data) instead of in memory")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Retrain this many symbols in parallel processes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fine-tune only on bars since the last retrain (plus a replay sample)")
+    parser.add_argument("--export-tflite", action="store_true",
+                        help="Convert each retrained model to TFLite and validate it")
+    parser.add_argument("--quantize", choices=tflite_export.QUANTIZE_MODES,
+                        help="Post-training quantization for --export-tflite")
+    args = parser.parse_args()
+    retrain_all(streaming=args.streaming, workers=args.workers, incremental=args.incremental,
+                export_tflite=args.export_tflite, quantize=args.quantize)
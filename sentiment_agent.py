@@ -1,9 +1,10 @@
 # sentiment_agent.py
-import requests
 from transformers import pipeline
 import os
 from datetime import date, timedelta
 from dotenv import load_dotenv
+from providers import finnhub_provider, run_sync, ProviderError
+from provider_replay import FixtureMissing, ReplayedError
 
 # -------------------- SETUP --------------------
 
@@ -11,7 +12,6 @@ from dotenv import load_dotenv
 load_dotenv()
 
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
-FINNHUB_NEWS_URL = "https://finnhub.io/api/v1/news"
 
 # Best financial sentiment model
 sentiment_model = pipeline(
@@ -35,17 +35,15 @@ def fetch_general_news(symbol=None):
     from_date = (today - timedelta(days=7)).isoformat()
     to_date = today.isoformat()
 
-    params = {"category": "general", "token": FINNHUB_API_KEY}
-
     print(f"Fetching general news from {from_date} to {to_date}...")
 
-    response = requests.get(FINNHUB_NEWS_URL, params=params)
-    if response.status_code != 200:
-        print("❌ Error fetching news:", response.text)
+    try:
+        data = run_sync(finnhub_provider.general_news("general"))
+    except (ProviderError, ReplayedError, FixtureMissing) as e:
+        # Replay mode serves recorded failures and has no fixture for unrecorded calls
+        print("❌ Error fetching news:", e)
         return []
 
-    data = response.json()
-
     if symbol:
         symbol = symbol.lower()
         data = [
@@ -0,0 +1,46 @@
+# NumPy inference kernel and model bundles against the Keras model they come from
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+from numpy_lstm import NumpyLSTM
+from model_bundle import write_bundle, read_bundle
+
+TIME_STEPS, FEATURES = 20, 5
+
+
+@pytest.fixture
+def keras_model(tmp_path, monkeypatch):
+    """A small build_lstm_model saved as .h5: (model, path)."""
+    monkeypatch.chdir(tmp_path)  # train.py creates models/ on import
+    from train import build_lstm_model
+
+    model = build_lstm_model((TIME_STEPS, FEATURES), units=16)
+    path = str(tmp_path / "model.h5")
+    model.save(path)
+    return model, path
+
+
+@pytest.fixture
+def windows():
+    return np.random.default_rng(0).random((8, TIME_STEPS, FEATURES), dtype=np.float32)
+
+
+def test_numpy_kernel_matches_keras(keras_model, windows):
+    model, path = keras_model
+    expected = model.predict(windows, verbose=0)
+    np.testing.assert_allclose(NumpyLSTM.from_h5(path).predict(windows), expected, atol=1e-5)
+
+
+def test_bundle_round_trip(keras_model, windows, tmp_path):
+    model, path = keras_model
+    kernel = NumpyLSTM.from_h5(path)
+    scaler = MinMaxScaler().fit(np.random.default_rng(1).random((50, FEATURES)) * 100)
+    metrics = {"symbol": "TEST", "rmse": 1.5, "time_steps": TIME_STEPS}
+
+    bundle = read_bundle(write_bundle(str(tmp_path / "TEST.bundle"), kernel, scaler, metrics))
+
+    assert bundle["metrics"] == metrics
+    assert bundle["model"].input_shape == kernel.input_shape
+    np.testing.assert_allclose(bundle["model"].predict(windows), model.predict(windows, verbose=0), atol=1e-5)
+    sample = np.random.default_rng(2).random((10, FEATURES)) * 100
+    np.testing.assert_array_equal(bundle["scaler"].transform(sample), scaler.transform(sample))
@@ -0,0 +1,105 @@
+# Provider client against a local fake Finnhub server
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from providers import ProviderClient, ProviderError, run_sync
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CANDLES = {"s": "ok", "t": [1760572800], "o": [150.1], "h": [151.2], "l": [149.3], "c": [150.9], "v": [1200]}
+
+
+class FakeFinnhub(BaseHTTPRequestHandler):
+    """stock/candle answers CANDLES; flaky fails with 503 twice; slow takes 0.2s."""
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?")[0]
+        with server.lock:
+            server.calls[path] = server.calls.get(path, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            calls = server.calls[path]
+        try:
+            if path == "/stock/candle":
+                self._reply(200, CANDLES)
+            elif path == "/flaky":
+                self._reply(503 if calls <= 2 else 200, {"calls": calls})
+            elif path == "/slow":
+                time.sleep(0.2)
+                self._reply(200, {})
+            else:
+                self._reply(404, {"error": "not found"})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_finnhub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFinnhub)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.calls, server.in_flight, server.max_in_flight = {}, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _client(server, **kwargs):
+    return ProviderClient("Fake", _url(server), calls_per_minute=6000, backoff_base=0, **kwargs)
+
+
+def test_finnhub_base_url_points_the_client_at_the_fake_server(fake_finnhub):
+    script = (
+        "import json; from providers import finnhub_provider, run_sync; "
+        "print(json.dumps(run_sync(finnhub_provider.stock_candles('AAPL', 'D', 0, 86400))))"
+    )
+    env = {**os.environ, "FINNHUB_BASE_URL": _url(fake_finnhub), "STOCKSENSE_PROVIDER_MODE": "live"}
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=60, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == CANDLES
+    assert fake_finnhub.calls["/stock/candle"] == 1
+
+
+def test_retryable_status_is_retried(fake_finnhub):
+    assert run_sync(_client(fake_finnhub).get_json("flaky")) == {"calls": 3}
+
+
+def test_non_retryable_status_raises(fake_finnhub):
+    with pytest.raises(ProviderError):
+        run_sync(_client(fake_finnhub).get_json("missing"))
+    assert fake_finnhub.calls["/missing"] == 1
+
+
+def test_concurrency_limit_holds_across_callers(fake_finnhub):
+    # Every run_sync call gets its own event loop, as dashboard sessions and workers do
+    client = _client(fake_finnhub, max_concurrency=2)
+    threads = [threading.Thread(target=lambda: run_sync(client.get_json("slow"))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_finnhub.calls["/slow"] == 6
+    assert fake_finnhub.max_in_flight == 2
@@ -0,0 +1,268 @@
+# tflite_export.py
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+
+# Post-training quantization modes accepted by export_tflite (None = float32)
+#   dynamic: int8 weights, float activations (no calibration data needed)
+#   float16: float16 weights
+#   int8:    int8 weights and activations, calibrated on training windows
+QUANTIZE_MODES = ("dynamic", "float16", "int8")
+
+# Training windows fed to the int8 calibration
+REPRESENTATIVE_SAMPLES = 200
+
+# The export passes validation when no prediction on the test windows moves
+# by more than this fraction of the price
+DEFAULT_TOLERANCE = 0.01
+
+# Single-window predictions timed per runtime (median is reported)
+LATENCY_RUNS = 50
+
+
+def tflite_path(symbol, backend="lstm"):
+    return os.path.join("models", f"{symbol}_{backend}_model.tflite")
+
+
+def report_path(symbol):
+    return os.path.join("models", f"{symbol}_tflite_report.json")
+
+
+def load_report(symbol):
+    """Validation report of the TFLite export of `symbol`'s current model ({} if there is none)."""
+    from model_registry import resolve
+
+    path = resolve(symbol, report_path(symbol))
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+# ===========================================
+#  INTERPRETER
+# ===========================================
+def _interpreter_class():
+    """The slimmest TFLite interpreter that is installed.
+
+    tflite-runtime (or its successor ai-edge-litert) is a few MB and doesn't
+    need TensorFlow; full TensorFlow works too.
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteForecaster:
+    """A converted model run by the TFLite interpreter.
+
+    Exposes `predict` and `input_shape` like the other backends. The graph
+    takes one window at a time, so `predict` loops over the rows of its
+    input; calls are serialized because the interpreter holds its tensors.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.interpreter = _interpreter_class()(model_path=path)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None, *self._input["shape"][1:])
+        self._lock = threading.Lock()
+
+    def _quantize(self, x, detail):
+        scale, zero_point = detail["quantization"]
+        if detail["dtype"] == np.float32 or not scale:
+            return x.astype(detail["dtype"])
+        return np.round(x / scale + zero_point).astype(detail["dtype"])
+
+    def _dequantize(self, y, detail):
+        scale, zero_point = detail["quantization"]
+        if detail["dtype"] == np.float32 or not scale:
+            return y.astype(np.float32)
+        return ((y.astype(np.float32) - zero_point) * scale).astype(np.float32)
+
+    def predict(self, X, **kwargs):
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), 1), dtype=np.float32)
+        with self._lock:
+            for i in range(len(X)):
+                self.interpreter.set_tensor(self._input["index"], self._quantize(X[i:i + 1], self._input))
+                self.interpreter.invoke()
+                out[i] = self._dequantize(self.interpreter.get_tensor(self._output["index"]), self._output)[0]
+        return out
+
+
+def load_tflite_forecaster(symbol, backend="lstm"):
+    """TFLiteForecaster for `symbol`, or None if there is no usable export.
+
+    The export is read from the model's current version (see
+    model_registry.resolve). One made from a different model, or one that
+    failed validation, is not served.
+    """
+    from backends import model_path
+    from model_registry import resolve
+
+    path = resolve(symbol, tflite_path(symbol, backend))
+    if not os.path.exists(path):
+        return None
+    source = resolve(symbol, model_path(symbol, backend))
+    if os.path.dirname(source) != os.path.dirname(path):
+        print(f"⚠️ The current {symbol} version has no TFLite export; re-export it (train.py --export-tflite). Using Keras.")
+        return None
+    if os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path):
+        print(f"⚠️ {path} is older than {source}; re-export it (train.py --export-tflite). Using Keras.")
+        return None
+    if load_report(symbol).get("passed") is False:
+        print(f"⚠️ {path} failed validation (see {report_path(symbol)}). Using Keras.")
+        return None
+    return TFLiteForecaster(path)
+
+
+# ===========================================
+#  CONVERSION
+# ===========================================
+def _convert(saved_model_dir, quantize=None, representative=None):
+    """TFLite flatbuffer (bytes) of a SavedModel."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.representative_dataset = lambda: ([window[np.newaxis]] for window in representative)
+    return converter.convert()
+
+
+def _convert_isolated(saved_model_dir, quantize, representative):
+    """Run `_convert` in a fresh process.
+
+    int8 calibration runs the graph inside the converter, which crashes the
+    whole process on some TensorFlow builds; isolating it turns that into an
+    exception the caller can handle.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_convert, saved_model_dir, quantize, representative).result()
+
+
+def _latency_ms(predict, X):
+    predict(X)  # warm-up (graph tracing)
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        started = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+
+def export_tflite(symbol, model, X_test, y_test, scaler, backend="lstm", quantize=None,
+                  representative=None, tolerance=DEFAULT_TOLERANCE):
+    """Convert a trained Keras model of `symbol` to TFLite and validate it.
+
+    The model is exported as a SavedModel with a fixed [1, time_steps,
+    features] signature and converted from there (the LSTM loop only
+    converts to builtin TFLite ops with a static batch size). `quantize` is
+    one of QUANTIZE_MODES; int8 calibrates on `representative` windows and
+    falls back to dynamic-range quantization if calibration fails.
+
+    Predictions on the test windows and single-window latency are compared
+    against the Keras model and written to models/{symbol}_tflite_report.json.
+    Returns the report (None when `model` isn't a Keras model).
+    """
+    import tensorflow as tf
+    from prepare_data import inverse_transform_close
+    from predict import compiled_forward
+    from backends import model_path, write_atomically
+
+    if quantize not in (None, *QUANTIZE_MODES):
+        raise ValueError(f"Unknown quantization {quantize!r}, choose from {', '.join(QUANTIZE_MODES)}")
+    if not hasattr(model, "export") or len(model.inputs) != 1:
+        print(f"ℹ️ {symbol}: only single-input Keras models are exported to TFLite, skipping.")
+        return None
+
+    if not isinstance(X_test, np.ndarray):
+        # Streaming training evaluates on an ordered tf.data pipeline of (X, y) batches
+        X_test = np.concatenate([X for X, _ in X_test.as_numpy_iterator()])
+    X_test = np.asarray(X_test, dtype=np.float32)
+    if representative is None:
+        representative = X_test
+    representative = np.asarray(representative[-REPRESENTATIVE_SAMPLES:], dtype=np.float32)
+
+    print(f"\n📦 Exporting {symbol} to TFLite ({quantize or 'float32'})...")
+    path = tflite_path(symbol, backend)
+    saved_model_dir = tempfile.mkdtemp(prefix=f"{symbol}_savedmodel_")
+    try:
+        model.export(saved_model_dir, format="tf_saved_model", verbose=False,
+                     input_signature=[tf.TensorSpec([1, *model.input_shape[1:]], tf.float32)])
+        applied = quantize
+        if quantize == "int8":
+            try:
+                flatbuffer = _convert_isolated(saved_model_dir, quantize, representative)
+            except Exception as e:
+                print(f"⚠️ int8 calibration failed for {symbol} ({type(e).__name__}); "
+                      f"using dynamic-range quantization instead.")
+                applied = "dynamic"
+                flatbuffer = _convert(saved_model_dir, applied)
+        else:
+            flatbuffer = _convert(saved_model_dir, quantize)
+    finally:
+        shutil.rmtree(saved_model_dir, ignore_errors=True)
+
+    def write_flatbuffer(tmp):
+        with open(tmp, "wb") as f:
+            f.write(flatbuffer)
+    write_atomically(path, write_flatbuffer)
+
+    # Validate against the Keras model on the test windows, in price units
+    lite = TFLiteForecaster(path)
+    keras_forward = compiled_forward(model)
+    y_true = inverse_transform_close(scaler, y_test)
+    y_keras = inverse_transform_close(scaler, keras_forward(X_test))
+    y_lite = inverse_transform_close(scaler, lite.predict(X_test))
+    diff = np.abs(y_lite - y_keras)
+    max_rel_diff = float(np.max(diff / np.abs(y_keras)))
+
+    report = {
+        "symbol": symbol,
+        "backend": backend,
+        "quantization": applied or "float32",
+        "requested_quantization": quantize or "float32",
+        "exported_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "test_windows": len(X_test),
+        "max_abs_diff": float(np.max(diff)),
+        "mean_abs_diff": float(np.mean(diff)),
+        "max_rel_diff": max_rel_diff,
+        "keras_rmse": float(np.sqrt(np.mean((y_true - y_keras) ** 2))),
+        "tflite_rmse": float(np.sqrt(np.mean((y_true - y_lite) ** 2))),
+        "keras_latency_ms": round(_latency_ms(keras_forward, X_test[-1:]), 3),
+        "tflite_latency_ms": round(_latency_ms(lite.predict, X_test[-1:]), 3),
+        "keras_bytes": os.path.getsize(model_path(symbol, backend)),
+        "tflite_bytes": len(flatbuffer),
+        "tolerance": tolerance,
+        "passed": max_rel_diff <= tolerance,
+    }
+    def write_report(path):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+    write_atomically(report_path(symbol), write_report)
+
+    icon = "✅" if report["passed"] else "⚠️"
+    print(f"{icon} {path}: {report['tflite_bytes'] / 1024:.0f} KB, max diff ${report['max_abs_diff']:.4f} "
+          f"({max_rel_diff:.3%}), RMSE {report['tflite_rmse']:.3f} vs {report['keras_rmse']:.3f}, "
+          f"latency {report['tflite_latency_ms']}ms vs {report['keras_latency_ms']}ms")
+    return report
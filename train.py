@@ -1,11 +1,23 @@
 # train.py
 import os
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
-from keras.models import Sequential
-from keras.layers import LSTM, Dense, Dropout
-from keras.callbacks import EarlyStopping
-from finnhub_client import fetch_stock_data
-from prepare_data import prepare_lstm_data
+import pandas as pd
+from keras.models import Sequential, Model
+from keras.layers import LSTM, Dense, Dropout, Input, Embedding, Flatten, RepeatVector, Concatenate
+from keras.callbacks import EarlyStopping, Callback
+from keras.optimizers import Adam
+from finnhub_client import fetch_stock_data, fetch_stock_data_many
+from prepare_data import prepare_lstm_data, prepare_lstm_dataset, array_dataset, feature_list, inverse_transform_close
+from feature_store import get_features
+import backends
+import tflite_export
+import prediction_cache
+import model_registry
+from backends import GLOBAL_MODEL_PATH, GLOBAL_SCALERS_PATH, GLOBAL_METRICS_PATH
 import joblib  # For saving the scaler
 import json
 from datetime import datetime
@@ -19,47 +31,195 @@ os.makedirs("models", exist_ok=True)
 # List of stock symbols to train
 STOCK_LIST = ["AAPL", "MSFT", "TSLA", "GOOGL", "AMZN", "META", "NFLX", "INFY"]
 
-def build_lstm_model(input_shape):
-    """Define and compile the LSTM model."""
+# Defaults for the settings tune.py searches over
+DEFAULT_HYPERPARAMS = {
+    "time_steps": 60,
+    "units": 50,
+    "dropout": 0.2,
+    "batch_size": 32,
+    "epochs": 20,
+}
+
+# CPU performance mode: batches this many times larger, with Adam's
+# learning rate scaled by the square root of the factor
+PERF_BATCH_MULTIPLIER = 8
+BASE_LEARNING_RATE = 0.001
+
+def load_tuned_hyperparams(symbol):
+    """Best settings recorded by tune.py for `symbol`, or None."""
+    path = f"models/{symbol}_tuning.json"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        best = json.load(f).get("best")
+    return best["params"] if best else None
+
+
+def build_lstm_model(input_shape, units=50, dropout=0.2, learning_rate=BASE_LEARNING_RATE,
+                     jit_compile="auto"):
+    """Define and compile the LSTM model (`jit_compile=True` forces XLA train steps)."""
     model = Sequential()
-    model.add(LSTM(50, return_sequences=True, input_shape=input_shape))
-    model.add(Dropout(0.2))
-    model.add(LSTM(50, return_sequences=False))
-    model.add(Dropout(0.2))
-    model.add(Dense(25))
+    model.add(LSTM(units, return_sequences=True, input_shape=input_shape))
+    model.add(Dropout(dropout))
+    model.add(LSTM(units, return_sequences=False))
+    model.add(Dropout(dropout))
+    model.add(Dense(max(1, units // 2)))
     model.add(Dense(1))
+    model.compile(optimizer=Adam(learning_rate), loss='mean_squared_error', jit_compile=jit_compile)
+    return model
+
+
+class ThroughputLogger(Callback):
+    """Print (and keep) training samples/sec for every epoch.
+
+    Pass `samples` when the epoch size is known; otherwise it is estimated
+    from the number of batches × `batch_size`.
+    """
+
+    def __init__(self, samples=None, batch_size=None):
+        super().__init__()
+        self.samples = samples
+        self.batch_size = batch_size
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._batches = 0
+        self._started = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._started
+        samples = self.samples or self._batches * (self.batch_size or 1)
+        self.history.append(samples / seconds)
+        print(f"⚡ Epoch {epoch + 1}: {samples / seconds:,.0f} samples/sec ({seconds:.2f}s)")
+
+    def steady_rate(self):
+        """Mean samples/sec without the first epoch (which includes tracing/compilation)."""
+        rates = self.history[1:] or self.history
+        return float(np.mean(rates)) if rates else None
+
+
+def optimizer_state_path(symbol):
+    return f"models/{symbol}_optimizer.npz"
+
+
+def save_optimizer_state(model, path):
+    """Save the optimizer's variables (step count, Adam moments) next to the model."""
+    np.savez(path, *[v.numpy() for v in model.optimizer.variables])
+
+
+def compile_for_finetuning(model, path):
+    """Compile a model loaded with compile=False and restore its saved optimizer state.
+
+    Keras can't resume the optimizer stored inside a .h5 file, so its state
+    lives in a separate .npz written by `save_optimizer_state`.
+    """
     model.compile(optimizer='adam', loss='mean_squared_error')
+    if not os.path.exists(path):
+        return model
+    model.optimizer.build(model.trainable_variables)
+    with np.load(path) as saved:
+        values = [saved[f"arr_{i}"] for i in range(len(saved.files))]
+    variables = model.optimizer.variables
+    if len(values) != len(variables) or any(tuple(v.shape) != a.shape for v, a in zip(variables, values)):
+        print(f"⚠️ Optimizer state in {path} doesn't match the model, starting fresh")
+        return model
+    for variable, value in zip(variables, values):
+        variable.assign(value)
     return model
 
-def train_model_for_symbol(symbol):
-    """Train and save model for one company."""
-    print(f"\n🚀 Training LSTM model for {symbol}...")
+
+def train_model_for_symbol(symbol, streaming=False, feature_columns=None, hyperparams=None, perf=False,
+                           xla=False, backend="lstm", export_tflite=False, quantize=None):
+    """Train and save model for one company.
+
+    With `streaming`, windows are built on the fly by a tf.data pipeline
+    instead of being materialized in memory up front. `feature_columns` adds
+    feature-store columns (e.g. RSI, MACD) to the model input.
+    `hyperparams` overrides entries of DEFAULT_HYPERPARAMS (e.g. the best
+    trial found by tune.py).
+
+    `perf` is the CPU performance mode: batches PERF_BATCH_MULTIPLIER×
+    larger with a scaled learning rate and a shuffled, prefetched tf.data
+    input pipeline. `xla` forces XLA-compiled train steps; it is off by
+    default because XLA runs the LSTM loop several times slower on our CPU
+    nodes, so compare the samples/sec it reports before turning it on. Set
+    thread counts with `configure_threads` before the first model is built.
+
+    `backend` picks the model type from backends.BACKENDS (lstm, gru,
+    conv1d, ridge); it is recorded in the metrics file so predict.py and the
+    dashboard serve the same backend.
+
+    `export_tflite` also converts Keras models to models/{symbol}_{backend}_model.tflite
+    (optionally quantized, see tflite_export.QUANTIZE_MODES) and validates
+    the export against the test split.
+    """
+    hp = {**DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+    time_steps = hp["time_steps"]
+    batch_size = hp["batch_size"]
+    learning_rate = BASE_LEARNING_RATE
+    print(f"\n🚀 Training {backend.upper()} model for {symbol}...")
+    keras_backend = backends.is_keras_backend(backend)
+    if streaming and not keras_backend:
+        print(f"ℹ️ The {backend} backend fits in closed form, ignoring --streaming")
+        streaming = False
+    if perf and not keras_backend:
+        print(f"ℹ️ The {backend} backend fits in closed form, ignoring --perf")
+        perf = False
+    if perf:
+        batch_size *= PERF_BATCH_MULTIPLIER
+        learning_rate *= PERF_BATCH_MULTIPLIER ** 0.5
 
     df = fetch_stock_data(symbol)
     if df.empty:
         print(f"⚠️ No data available for {symbol}, skipping.")
         return
 
-    # Prepare data
-    X_train, y_train, scaler, X_test, y_test = prepare_lstm_data(df, return_test=True)
-    model = build_lstm_model((X_train.shape[1], 1))
+    features = feature_list(feature_columns)
+    if len(features) > 1:
+        df = get_features(symbol, df)
 
+    # Prepare data
     es = EarlyStopping(monitor='loss', patience=5, restore_best_weights=True)
-    model.fit(X_train, y_train, epochs=20, batch_size=32, verbose=1, callbacks=[es])
+    model = backends.build_model(backend, (time_steps, len(features)), hp,
+                                 learning_rate, jit_compile=True if xla else "auto")
+    started = time.perf_counter()
+    if streaming:
+        # X_test is an ordered tf.data.Dataset here; model.predict takes either
+        train_ds, scaler, X_test, y_test = prepare_lstm_dataset(
+            df, time_steps=time_steps, batch_size=batch_size, return_test=True, feature_columns=features)
+        throughput = ThroughputLogger(batch_size=batch_size)
+        model.fit(train_ds, epochs=hp["epochs"], verbose=1, callbacks=[es, throughput])
+    else:
+        X_train, y_train, scaler, X_test, y_test = prepare_lstm_data(
+            df, time_steps, return_test=True, feature_columns=features)
+        throughput = ThroughputLogger(samples=len(X_train))
+        if perf:
+            train_ds = array_dataset(X_train, y_train, batch_size)
+            model.fit(train_ds, epochs=hp["epochs"], verbose=1, callbacks=[es, throughput])
+        else:
+            model.fit(X_train, y_train, epochs=hp["epochs"], batch_size=batch_size, verbose=1,
+                      callbacks=[es, throughput])
+
+    train_seconds = time.perf_counter() - started
 
     # Save model and scaler
-    model_path = f"models/{symbol}_lstm_model.h5"
+    model_path = backends.save_model(model, symbol, backend)
     scaler_path = f"models/{symbol}_scaler.pkl"
-    model.save(model_path)
-    joblib.dump(scaler, scaler_path)
+    backends.write_atomically(scaler_path, lambda path: joblib.dump(scaler, path))
+    if keras_backend:
+        save_optimizer_state(model, optimizer_state_path(symbol))
+    prediction_cache.invalidate(symbol)
 
     print(f"✅ Model and scaler saved for {symbol}:")
     print(f"   - Model: {model_path}")
     print(f"   - Scaler: {scaler_path}")
 
     # Evaluate on test set
-    y_true = scaler.inverse_transform(y_test.reshape(-1, 1))
-    y_pred = scaler.inverse_transform(model.predict(X_test))
+    y_true = inverse_transform_close(scaler, y_test)
+    y_pred = inverse_transform_close(scaler, model.predict(X_test))
 
     rmse = np.sqrt(mean_squared_error(y_true, y_pred))
     mae = mean_absolute_error(y_true, y_pred)
@@ -67,34 +227,267 @@ def train_model_for_symbol(symbol):
 
     metrics = {
         "symbol": symbol,
+        "backend": backend,
         "rmse": float(rmse),
         "mae": float(mae),
         "mape": float(mape),
         "trained_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "data_points": len(df)
+        "data_points": len(df),
+        "features": features,
+        "time_steps": time_steps,
+        "hyperparams": hp,
+        "perf_mode": perf,
+        "xla": xla,
+        "samples_per_sec": throughput.steady_rate(),
+        "train_seconds": round(train_seconds, 2),
+        # Last bar seen in training; incremental retrains start after it
+        "cutoff_date": pd.Timestamp(df['date'].iloc[-1]).strftime("%Y-%m-%d"),
     }
 
-    with open(f"models/{symbol}_metrics.json", "w") as f:
-        json.dump(metrics, f, indent=4)
+    def write_metrics(path):
+        with open(path, "w") as f:
+            json.dump(metrics, f, indent=4)
+    backends.write_atomically(f"models/{symbol}_metrics.json", write_metrics)
+
+    if export_tflite and keras_backend:
+        tflite_export.export_tflite(symbol, model, X_test, y_test, scaler, backend, quantize,
+                                    representative=None if streaming else X_train)
 
+    # Serving processes pick the new version up from the registry
+    model_registry.publish(symbol)
+
+    return model
 
 
-def train_all_stocks():
-    """Train all stocks in the list sequentially."""
-    for symbol in STOCK_LIST:
+
+# ===========================================
+#  GLOBAL MULTI-SYMBOL MODEL
+# ===========================================
+def build_global_model(input_shape, n_symbols, embedding_dim=8):
+    """LSTM over (window, symbol id) inputs; the learned symbol embedding is
+    appended to every time step of the window."""
+    window = Input(shape=input_shape, name="window")
+    symbol_id = Input(shape=(1,), dtype="int32", name="symbol_id")
+    embedded = Flatten()(Embedding(n_symbols, embedding_dim, name="symbol_embedding")(symbol_id))
+    x = Concatenate()([window, RepeatVector(input_shape[0])(embedded)])
+    x = LSTM(50, return_sequences=True)(x)
+    x = Dropout(0.2)(x)
+    x = LSTM(50, return_sequences=False)(x)
+    x = Dropout(0.2)(x)
+    x = Dense(25)(x)
+    output = Dense(1)(x)
+    model = Model(inputs=[window, symbol_id], outputs=output)
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+def train_global_model(symbols=None, feature_columns=None, time_steps=60):
+    """Train one model on every symbol and save it with one scaler per symbol.
+
+    Each symbol is min-max scaled on its own history, so the network sees
+    comparable ranges, and its id goes through a learned embedding. Symbol
+    ids are positions in the "symbols" list of the metrics file.
+    """
+    symbols = list(symbols or STOCK_LIST)
+    features = feature_list(feature_columns)
+    print(f"\n🌐 Training global LSTM model on {len(symbols)} symbols...")
+
+    frames = fetch_stock_data_many(symbols)
+    trained, scalers, train_parts, test_parts = [], {}, [], []
+    for symbol in symbols:
+        df = frames.get(symbol)
+        if df is None or df.empty:
+            print(f"⚠️ No data available for {symbol}, leaving it out.")
+            continue
+        if len(features) > 1:
+            df = get_features(symbol, df)
         try:
-            train_model_for_symbol(symbol)
-        except Exception as e:
-            print(f"❌ Error training {symbol}: {e}")
+            X_train, y_train, scaler, X_test, y_test = prepare_lstm_data(
+                df, time_steps, return_test=True, feature_columns=features)
+        except ValueError as e:
+            print(f"⚠️ Skipping {symbol}: {e}")
+            continue
+        symbol_id = len(trained)
+        trained.append(symbol)
+        scalers[symbol] = scaler
+        train_parts.append((X_train, y_train, np.full(len(X_train), symbol_id, dtype=np.int32)))
+        test_parts.append((X_test, y_test, np.full(len(X_test), symbol_id, dtype=np.int32)))
+
+    if not trained:
+        print("❌ No symbol had enough data for the global model.")
+        return None
+
+    X_train = np.concatenate([p[0] for p in train_parts])
+    y_train = np.concatenate([p[1] for p in train_parts])
+    ids_train = np.concatenate([p[2] for p in train_parts])
+
+    model = build_global_model((time_steps, len(features)), len(trained))
+    es = EarlyStopping(monitor='loss', patience=5, restore_best_weights=True)
+    model.fit([X_train, ids_train], y_train, epochs=20, batch_size=64, shuffle=True,
+              verbose=1, callbacks=[es])
+
+    # Evaluate every symbol on its own test split
+    per_symbol = {}
+    for symbol, (X_test, y_test, ids_test) in zip(trained, test_parts):
+        y_true = inverse_transform_close(scalers[symbol], y_test)
+        y_pred = inverse_transform_close(scalers[symbol], model.predict([X_test, ids_test], verbose=0))
+        per_symbol[symbol] = {
+            "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+            "mae": float(mean_absolute_error(y_true, y_pred)),
+            "mape": float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100),
+        }
+
+    metrics = {
+        "symbols": trained,
+        "features": features,
+        "time_steps": time_steps,
+        "trained_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "data_points": int(len(X_train)),
+        "per_symbol": per_symbol,
+    }
+
+    # Write next to the old files and swap them in, model last: serving
+    # processes reload when the model file changes and never see it half-written
+    staged = {path: f"{path}.staged" for path in (GLOBAL_SCALERS_PATH, GLOBAL_METRICS_PATH)}
+    staged[GLOBAL_MODEL_PATH] = GLOBAL_MODEL_PATH.replace(".h5", ".staged.h5")
+    model.save(staged[GLOBAL_MODEL_PATH])
+    joblib.dump(scalers, staged[GLOBAL_SCALERS_PATH])
+    with open(staged[GLOBAL_METRICS_PATH], "w") as f:
+        json.dump(metrics, f, indent=4)
+    for path in (GLOBAL_SCALERS_PATH, GLOBAL_METRICS_PATH, GLOBAL_MODEL_PATH):
+        os.replace(staged[path], path)
+    prediction_cache.invalidate(global_model=True)
+
+    print(f"✅ Global model saved: {GLOBAL_MODEL_PATH} ({len(trained)} symbols)")
+    return model
+
+
+# ===========================================
+#  PARALLEL TRAINING
+# ===========================================
+def configure_threads(intra_op=None, inter_op=None):
+    """Limit the TensorFlow thread pools of this process.
+
+    Must run before TensorFlow executes its first op, so pool workers call it
+    as their initializer. (Environment variables such as OMP_NUM_THREADS
+    would come too late: unpickling the job already imports TensorFlow.)
+    """
+    import tensorflow as tf
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def _run_job(func, symbol, kwargs):
+    """Run func(symbol, **kwargs) and report the outcome instead of raising."""
+    started = time.perf_counter()
+    try:
+        model = func(symbol, **kwargs)
+        status, error = ("ok", None) if model is not None else ("skipped", None)
+    except Exception as e:
+        traceback.print_exc()
+        status, error = "failed", f"{type(e).__name__}: {e}"
+    return {"symbol": symbol, "status": status, "error": error,
+            "seconds": round(time.perf_counter() - started, 1)}
+
+
+def run_for_symbols(func, symbols, workers=1, **kwargs):
+    """Run a per-symbol training function over `symbols` and collect the outcomes.
+
+    With `workers` > 1 every symbol trains in its own process (spawned, so
+    no TensorFlow state is inherited) and the CPU cores are split evenly
+    between the workers' TensorFlow thread pools. A symbol that fails, or
+    whose worker dies, is reported without stopping the others.
+    Returns a list of {"symbol", "status", "error", "seconds"} dicts.
+    """
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(symbols)))
+
+    if workers == 1:
+        results = [_run_job(func, symbol, kwargs) for symbol in symbols]
+    else:
+        intra_op = max(1, (os.cpu_count() or 1) // workers)
+        print(f"⚙️ Training {len(symbols)} symbols on {workers} workers ({intra_op} TF threads each)")
+        results = []
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=configure_threads,
+                                 initargs=(intra_op, 1)) as pool:
+            futures = {pool.submit(_run_job, func, symbol, kwargs): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:  # worker process crashed
+                    results.append({"symbol": symbol, "status": "failed",
+                                    "error": f"{type(e).__name__}: {e}", "seconds": None})
+        order = {symbol: i for i, symbol in enumerate(symbols)}
+        results.sort(key=lambda r: order[r["symbol"]])
+
+    print(f"\n📋 Finished {len(symbols)} symbols in {time.perf_counter() - started:.1f}s:")
+    for r in results:
+        icon = {"ok": "✅", "skipped": "⚠️", "failed": "❌"}[r["status"]]
+        took = f" ({r['seconds']}s)" if r["seconds"] is not None else ""
+        print(f"   {icon} {r['symbol']}: {r['status']}{took}" + (f" — {r['error']}" if r["error"] else ""))
+    return results
+
+
+def _train_tuned(symbol, **kwargs):
+    return train_model_for_symbol(symbol, hyperparams=load_tuned_hyperparams(symbol), **kwargs)
+
+
+def train_all_stocks(streaming=False, feature_columns=None, workers=1, tuned=False, perf=False, xla=False,
+                     backend="lstm", export_tflite=False, quantize=None):
+    """Train all stocks in the list, `workers` symbols at a time.
+
+    With `tuned`, each symbol uses the best settings found by tune.py (if any).
+    """
+    # Warm the candle store for every symbol in one batched fetch
+    fetch_stock_data_many(STOCK_LIST)
+    return run_for_symbols(_train_tuned if tuned else train_model_for_symbol, STOCK_LIST,
+                           workers=workers, streaming=streaming, feature_columns=feature_columns,
+                           perf=perf, xla=xla, backend=backend, export_tflite=export_tflite, quantize=quantize)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--symbol", type=str, help="Stock symbol to train")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Build training windows on the fly (tf.data) instead of in memory")
+    parser.add_argument("--features", type=str,
+                        help="Comma-separated feature-store columns to feed the model, e.g. close,volume,RSI,MACD")
+    parser.add_argument("--tuned", action="store_true",
+                        help="Use the best hyperparameters found by tune.py for each symbol")
+    parser.add_argument("--global", dest="global_model", action="store_true",
+                        help="Train one shared model for all symbols instead of one per symbol")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Train this many symbols in parallel processes")
+    parser.add_argument("--backend", choices=list(backends.BACKENDS), default="lstm",
+                        help="Model type to train")
+    parser.add_argument("--perf", action="store_true",
+                        help="CPU performance mode: larger batches with scaled learning rate, prefetching")
+    parser.add_argument("--xla", action="store_true", help="XLA-compile the train step")
+    parser.add_argument("--export-tflite", action="store_true",
+                        help="Also convert each trained model to TFLite and validate it against the Keras model")
+    parser.add_argument("--quantize", choices=tflite_export.QUANTIZE_MODES,
+                        help="Post-training quantization for --export-tflite")
+    parser.add_argument("--intra-op", type=int, help="TensorFlow intra-op threads")
+    parser.add_argument("--inter-op", type=int, help="TensorFlow inter-op threads")
     args = parser.parse_args()
+    features = args.features.split(",") if args.features else None
+    if args.intra_op or args.inter_op:
+        configure_threads(args.intra_op, args.inter_op)
 
-    if args.symbol:
-        train_model_for_symbol(args.symbol)
+    if args.global_model:
+        train_global_model(feature_columns=features)
+    elif args.symbol:
+        train_model_for_symbol(args.symbol, streaming=args.streaming, feature_columns=features,
+                               hyperparams=load_tuned_hyperparams(args.symbol) if args.tuned else None,
+                               perf=args.perf, xla=args.xla, backend=args.backend,
+                               export_tflite=args.export_tflite, quantize=args.quantize)
     else:
-        train_all_stocks()
+        train_all_stocks(streaming=args.streaming, feature_columns=features, workers=args.workers,
+                         tuned=args.tuned, perf=args.perf, xla=args.xla, backend=args.backend,
+                         export_tflite=args.export_tflite, quantize=args.quantize)
 
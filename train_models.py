@@ -1,6 +1,7 @@
 # train_models.py
 import sys
-from train import train_model_for_symbol, STOCK_LIST
+from train import train_model_for_symbol, run_for_symbols, STOCK_LIST
+from finnhub_client import fetch_stock_data_many
 
 def show_usage():
     print("""
@@ -8,6 +9,7 @@ Usage:
     python train_models.py all
     python train_models.py AAPL
     python train_models.py AAPL GOOGL TSLA
+    python train_models.py all --workers 4
 """)
 
 if __name__ == "__main__":
@@ -18,20 +20,34 @@ if __name__ == "__main__":
 
     args = sys.argv[1:]
 
+    # Parallel workers: --workers N
+    workers = 1
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            show_usage()
+            sys.exit(1)
+        del args[i:i + 2]
+
+    # Only --workers given → nothing to train
+    if not args:
+        show_usage()
+        sys.exit(1)
+
     # Train all stocks
     if args[0].lower() == "all":
         print("🚀 Training ALL stocks...")
-        for symbol in STOCK_LIST:
-            train_model_for_symbol(symbol)
+        fetch_stock_data_many(STOCK_LIST)
+        run_for_symbols(train_model_for_symbol, STOCK_LIST, workers=workers)
         print("✅ Training completed for all symbols")
         sys.exit(0)
 
     # Train selected stocks
     else:
         print("🚀 Training selected stocks:", args)
-        for symbol in args:
-            try:
-                train_model_for_symbol(symbol.upper())
-            except Exception as e:
-                print(f"❌ Error training {symbol}: {e}")
+        symbols = [symbol.upper() for symbol in args]
+        fetch_stock_data_many(symbols)
+        run_for_symbols(train_model_for_symbol, symbols, workers=workers)
         print("✅ Training completed for selected symbols")
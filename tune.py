@@ -0,0 +1,248 @@
+# tune.py
+import os
+import json
+import time
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+
+# Values tried for each setting (see train.DEFAULT_HYPERPARAMS)
+SEARCH_SPACE = {
+    "time_steps": [20, 40, 60],
+    "units": [16, 32, 50, 64],
+    "dropout": [0.0, 0.1, 0.2, 0.3],
+    "batch_size": [16, 32, 64],
+}
+
+# Successive halving: every trial trains MIN_EPOCHS, then the best 1/ETA of
+# them train ETA× as long, and so on up to MAX_EPOCHS
+MIN_EPOCHS = 2
+MAX_EPOCHS = 20
+ETA = 3
+
+# Last share of the training windows held out to rank trials; the test
+# split stays untouched so results compare with models/{symbol}_metrics.json
+VALIDATION_SPLIT = 0.2
+
+
+def tuning_path(symbol):
+    return f"models/{symbol}_tuning.json"
+
+
+def trial_weights_path(symbol, trial_id):
+    return os.path.join("models", "tuning", symbol, f"trial_{trial_id}.weights.h5")
+
+
+def sample_trials(n_trials, seed=0):
+    """`n_trials` distinct settings drawn from SEARCH_SPACE (the defaults come first)."""
+    from train import DEFAULT_HYPERPARAMS
+    rng = random.Random(seed)
+    defaults = {k: DEFAULT_HYPERPARAMS[k] for k in SEARCH_SPACE}
+    trials, seen = [defaults], {json.dumps(defaults, sort_keys=True)}
+    n_combinations = int(np.prod([len(v) for v in SEARCH_SPACE.values()]))
+    while len(trials) < min(n_trials, n_combinations):
+        params = {k: rng.choice(v) for k, v in SEARCH_SPACE.items()}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+def rung_epochs(min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    """Cumulative epoch budget of every rung, e.g. [2, 6, 18, 20]."""
+    rungs = [min_epochs]
+    while rungs[-1] < max_epochs:
+        rungs.append(min(rungs[-1] * eta, max_epochs))
+    return rungs
+
+
+# ===========================================
+#  ONE TRIAL (runs in a worker process)
+# ===========================================
+def run_trial(symbol, trial_id, params, epochs_done, epochs_target, feature_columns=None):
+    """Train one trial from `epochs_done` to `epochs_target` epochs and score it.
+
+    Weights are kept in models/tuning/{symbol}/ between rungs, so promoted
+    trials (and interrupted searches) resume instead of starting over.
+    """
+    from finnhub_client import fetch_stock_data
+    from feature_store import get_features
+    from prepare_data import prepare_lstm_data, feature_list, inverse_transform_close
+    from train import build_lstm_model
+
+    started = time.perf_counter()
+    df = fetch_stock_data(symbol)
+    features = feature_list(feature_columns)
+    if len(features) > 1:
+        df = get_features(symbol, df)
+
+    X_train, y_train, scaler, X_test, y_test = prepare_lstm_data(
+        df, params["time_steps"], return_test=True, feature_columns=features)
+    split = int(len(X_train) * (1 - VALIDATION_SPLIT))
+    X_fit, y_fit, X_val, y_val = X_train[:split], y_train[:split], X_train[split:], y_train[split:]
+
+    model = build_lstm_model((params["time_steps"], len(features)), params["units"], params["dropout"])
+    weights_path = trial_weights_path(symbol, trial_id)
+    if epochs_done and os.path.exists(weights_path):
+        # Build the optimizer first so its saved moments are restored too
+        model.optimizer.build(model.trainable_variables)
+        model.load_weights(weights_path)
+    else:
+        epochs_done = 0
+
+    model.fit(X_fit, y_fit, epochs=epochs_target, initial_epoch=epochs_done,
+              batch_size=params["batch_size"], verbose=0)
+    os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+    model.save_weights(weights_path)
+
+    def _score(X, y):
+        y_true = inverse_transform_close(scaler, y)
+        y_pred = inverse_transform_close(scaler, model.predict(X, verbose=0))
+        return (float(np.sqrt(np.mean((y_true - y_pred) ** 2))),
+                float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100))
+
+    val_rmse, val_mape = _score(X_val, y_val)
+    test_rmse, test_mape = _score(X_test, y_test)
+    return {
+        "trial": trial_id,
+        "epochs": epochs_target,
+        "val_rmse": val_rmse,
+        "val_mape": val_mape,
+        "test_rmse": test_rmse,
+        "test_mape": test_mape,
+        "param_count": int(model.count_params()),
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+# ===========================================
+#  SUCCESSIVE HALVING SEARCH
+# ===========================================
+def _load_state(symbol, trials, rungs, features):
+    """Results of an earlier run with the same trials, rungs and features, for resuming."""
+    path = tuning_path(symbol)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        state = json.load(f)
+    if (state.get("rungs") != rungs or state.get("features") != features
+            or [t["params"] for t in state.get("trials", [])] != trials):
+        return {}
+    return {t["trial"]: t["history"] for t in state["trials"]}
+
+
+def _save_state(symbol, trials, rungs, features, history, best=None, baseline=None):
+    state = {
+        "symbol": symbol,
+        "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "search_space": SEARCH_SPACE,
+        "rungs": rungs,
+        "features": features,
+        "trials": [{"trial": i, "params": p, "history": history.get(i, [])} for i, p in enumerate(trials)],
+        "best": best,
+        "baseline": baseline,
+    }
+    tmp_path = tuning_path(symbol) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, tuning_path(symbol))
+
+
+def tune_symbol(symbol, n_trials=12, workers=None, feature_columns=None, seed=0,
+                min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    """Search SEARCH_SPACE for `symbol` with successive halving across worker processes.
+
+    All surviving trials of a rung train concurrently; only the best 1/eta
+    (by validation RMSE) are promoted to the next, longer rung. Progress is
+    written to models/{symbol}_tuning.json after every trial, and a rerun
+    with the same settings picks up where the last one stopped.
+    """
+    from train import configure_threads
+    from finnhub_client import fetch_stock_data
+    from predict import load_model_metrics
+    from prepare_data import feature_list
+
+    os.makedirs("models", exist_ok=True)
+    # Warm the candle store once so workers read from it
+    fetch_stock_data(symbol)
+
+    trials = sample_trials(n_trials, seed)
+    rungs = rung_epochs(min_epochs, max_epochs, eta)
+    features = feature_list(feature_columns)
+    history = _load_state(symbol, trials, rungs, features)
+    workers = workers or os.cpu_count() or 1
+    intra_op = max(1, (os.cpu_count() or 1) // workers)
+    print(f"\n🔬 Tuning {symbol}: {len(trials)} trials, rungs {rungs}, {workers} workers")
+
+    alive = list(range(len(trials)))
+    epochs_done = 0
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=configure_threads, initargs=(intra_op, 1)) as pool:
+        for rung, epochs in enumerate(rungs):
+            results = {}
+            futures = {}
+            for trial_id in alive:
+                done = {r["epochs"]: r for r in history.get(trial_id, [])}
+                if epochs in done:
+                    results[trial_id] = done[epochs]
+                    continue
+                futures[pool.submit(run_trial, symbol, trial_id, trials[trial_id],
+                                    epochs_done, epochs, features)] = trial_id
+            for future in as_completed(futures):
+                trial_id = futures[future]
+                try:
+                    results[trial_id] = future.result()
+                except Exception as e:
+                    print(f"❌ Trial {trial_id} failed: {e}")
+                    continue
+                history.setdefault(trial_id, []).append(results[trial_id])
+                r = results[trial_id]
+                print(f"   trial {trial_id} @ {epochs} epochs: val RMSE {r['val_rmse']:.3f} ({r['seconds']}s)")
+                _save_state(symbol, trials, rungs, features, history)
+
+            ranked = sorted(results, key=lambda t: results[t]["val_rmse"])
+            if not ranked:
+                print(f"❌ Every trial failed for {symbol}.")
+                return None
+            keep = len(ranked) if rung == len(rungs) - 1 else max(1, len(ranked) // eta)
+            alive = ranked[:keep]
+            epochs_done = epochs
+            print(f"✂️ Rung {rung + 1}/{len(rungs)} ({epochs} epochs): keeping trials {alive}")
+
+    best_id = alive[0]
+    best_result = results[best_id]
+    best = {"trial": best_id, "params": {**trials[best_id], "epochs": rungs[-1]}, **best_result}
+
+    metrics = load_model_metrics(symbol)
+    baseline = {k: metrics[k] for k in ("rmse", "mape") if k in metrics} or None
+    _save_state(symbol, trials, rungs, features, history, best, baseline)
+
+    print(f"🏆 Best for {symbol}: {best['params']} → test RMSE {best['test_rmse']:.3f}, "
+          f"MAPE {best['test_mape']:.2f}%, {best['param_count']} params")
+    if baseline:
+        print(f"   current model: RMSE {baseline.get('rmse', float('nan')):.3f}, "
+              f"MAPE {baseline.get('mape', float('nan')):.2f}%")
+    print(f"   Train with it: python train.py --symbol {symbol} --tuned")
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the per-symbol LSTM models")
+    parser.add_argument("symbols", nargs="+", help="Stock symbols to tune")
+    parser.add_argument("--trials", type=int, default=12, help="Number of settings to try per symbol")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel trial processes (default: all cores)")
+    parser.add_argument("--max-epochs", type=int, default=MAX_EPOCHS)
+    parser.add_argument("--features", type=str,
+                        help="Comma-separated feature-store columns to feed the model, e.g. close,volume,RSI,MACD")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for sym in args.symbols:
+        tune_symbol(sym.upper(), n_trials=args.trials, workers=args.workers,
+                    feature_columns=args.features.split(",") if args.features else None,
+                    seed=args.seed, max_epochs=args.max_epochs)